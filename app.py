@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import httpx
+from telegram.ext import ApplicationBuilder
+import metrics
+from catalog import Catalog
+from concurrency import ChatOrderedUpdateProcessor
+from config import Config, load_config
+from funnel import Funnel
+from handlers import BotHandlers, register_handlers
+from lead_index import LeadIndex
+from lead_store import LeadStore
+from lead_writer import LeadWriter
+from media_cache import SampleMediaCache
+from metrics import InstrumentedRequest
+from notifier import OwnerNotifier
+from persistence import SQLitePersistence
+from throttle import Throttle
+from update_log import UpdateLog
+
+logger = logging.getLogger(__name__)
+
+
+def build_handlers(config: Config) -> BotHandlers:
+    # The stores, notifier and caches the handlers use, wired from the config.
+    lead_store = LeadStore()
+    lead_writer = LeadWriter(lead_store)
+    owner_notifier = OwnerNotifier(config.owner_chat_id, config.owner_rate_per_minute, config.owner_burst,
+                                   config.owner_digest)
+    proof_screener = None
+    if config.proof_screening:
+        # Only imported when enabled; Pillow is optional.
+        from proof_screen import ProofIndex, ProofScreener
+        if ProofScreener.available():
+            proof_screener = ProofScreener(ProofIndex(config.proof_db))
+        else:
+            logger.warning("PROOF_SCREENING is set but Pillow is not installed (pip install Pillow); proofs won't be screened")
+    metrics.LEAD_QUEUE_DEPTH.set_function(lambda: lead_writer.queue_depth)
+    metrics.NOTIFICATION_QUEUE_DEPTH.set_function(lambda: owner_notifier.queue_depth)
+    catalog = Catalog.load()
+    return BotHandlers(catalog, Funnel.load(catalog), LeadIndex(lead_store), lead_writer, owner_notifier,
+                       SampleMediaCache(version=config.samples_version, ttl=config.samples_ttl), proof_screener)
+
+
+def build_request(config: Config, pool: str, pool_size: int) -> InstrumentedRequest:
+    # A Bot API client with its own connection pool, timed for /metrics.
+    return InstrumentedRequest(
+        pool,
+        connection_pool_size=pool_size,
+        pool_timeout=config.api_pool_timeout,
+        connect_timeout=config.api_connect_timeout,
+        read_timeout=config.api_read_timeout,
+        write_timeout=config.api_write_timeout,
+        media_write_timeout=config.api_media_write_timeout,
+        http_version="2" if config.api_http2 else "1.1",
+        httpx_kwargs={"limits": httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                             keepalive_expiry=config.api_keepalive_expiry)}
+    )
+
+
+async def export_leads_periodically(lead_store: LeadStore, interval: int):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(lead_store.compact)
+        except Exception as e:
+            logger.error("Failed to export leads to Excel: %s", e)
+
+
+async def refresh_lead_index_periodically(lead_index: LeadIndex, interval: float):
+    # Index the leads other worker processes saved, for duplicate detection.
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            lead_index.add_rows(await asyncio.to_thread(lead_index.read_new))
+        except Exception as e:
+            logger.error("Failed to refresh the lead index: %s", e)
+
+
+def build_application(config: Config = None, handlers: BotHandlers = None, request=None,
+                      get_updates_request=None, shard: int = None):
+    # request/get_updates_request let benchmarks swap in a fake Bot API. shard
+    # is the worker's number when running as one of several processes (see
+    # shards.py); then only shard 0 exports the workbooks.
+    config = config or load_config()
+    handlers = handlers or build_handlers(config)
+    lead_store = handlers.lead_index.store
+    background_tasks = []
+    update_log = None
+    if config.update_log:
+        update_log = UpdateLog(config.update_log if shard is None else f"{config.update_log}.{shard}")
+
+    async def post_init(application):
+        await asyncio.to_thread(handlers.lead_index.rebuild)
+        handlers.lead_writer.start()
+        handlers.owner_notifier.start(application.bot)
+        if not shard:
+            background_tasks.append(asyncio.create_task(
+                export_leads_periodically(lead_store, config.leads_export_interval)
+            ))
+        if shard is not None and config.lead_index_refresh:
+            background_tasks.append(asyncio.create_task(
+                refresh_lead_index_periodically(handlers.lead_index, config.lead_index_refresh)
+            ))
+
+    async def post_stop(application):
+        # Submit the leads still being screened, then send the queued owner
+        # notifications while the bot can still send.
+        await handlers.finish_leads()
+        await handlers.owner_notifier.stop()
+
+    async def post_shutdown(application):
+        for task in background_tasks:
+            task.cancel()
+        background_tasks.clear()
+        if handlers.proof_screener:
+            handlers.proof_screener.shutdown()
+        # Write queued leads, then leave up-to-date workbooks behind (with
+        # shards, once every worker has stopped).
+        await handlers.lead_writer.stop()
+        if shard is None:
+            lead_store.compact()
+        if update_log:
+            update_log.close()
+
+    builder = (
+        ApplicationBuilder()
+        .token(config.token)
+        # Different chats run in parallel; each chat's updates stay in order.
+        .concurrent_updates(ChatOrderedUpdateProcessor(config.max_concurrent_updates))
+        .persistence(SQLitePersistence(config.state_db, update_interval=config.state_save_interval))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    # getUpdates long-polls on its own pool, so it never waits behind outbound calls.
+    builder = builder.request(request or build_request(config, "bot", config.api_pool_size))
+    builder = builder.get_updates_request(
+        get_updates_request or build_request(config, "get_updates", config.get_updates_pool_size)
+    )
+    application = builder.build()
+    throttle = Throttle(config.user_rate_per_minute, config.user_burst, config.start_debounce,
+                        config.callback_debounce)
+    register_handlers(application, handlers, throttle, update_log)
+    return application
+
+
+async def main():
+    config = load_config()
+    if config.workers > 1:
+        from shards import run_sharded
+        await run_sharded(config)
+        return
+    application = build_application(config)
+    # Metrics stay on a local port, off the public webhook listener.
+    await metrics.start_metrics_server(config.metrics_host, config.metrics_port)
+
+    if config.mode == "webhook":
+        from webhook import run_webhook
+        await run_webhook(application, config.webhook_url, config.webhook_secret, config.webhook_host,
+                          config.webhook_port, config.webhook_path)
+    else:
+        await application.run_polling()
@@ -0,0 +1,67 @@
+"""Throughput of ChatOrderedUpdateProcessor with simulated slow Bot API calls.
+
+Usage: python benchmarks/bench_concurrency.py [--chats 200] [--updates 5] [--latency 0.05]
+
+Every update awaits a fake API call of --latency seconds. For each concurrency
+limit the script reports updates per second and checks that every chat's
+updates were handled in the order they arrived.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concurrency import ChatOrderedUpdateProcessor
+
+
+async def run(limit: int, chats: int, updates: int, latency: float):
+    processor = ChatOrderedUpdateProcessor(limit)
+    handled = {}
+    in_flight = {}
+    overlaps = 0
+
+    async def handle(update):
+        nonlocal overlaps
+        chat_id = update.effective_chat.id
+        if in_flight.get(chat_id):
+            overlaps += 1
+        in_flight[chat_id] = True
+        await asyncio.sleep(latency)  # the slow send_photo / send_message
+        in_flight[chat_id] = False
+        handled.setdefault(chat_id, []).append(update.update_id)
+
+    # Interleave chats the way updates arrive from Telegram, created in order
+    # like Application does.
+    update_list = [
+        SimpleNamespace(update_id=n * chats + chat_id, effective_chat=SimpleNamespace(id=chat_id))
+        for n in range(updates) for chat_id in range(chats)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(processor.process_update(u, handle(u)) for u in update_list))
+    elapsed = time.perf_counter() - started
+
+    ordered = all(ids == sorted(ids) for ids in handled.values())
+    return len(update_list) / elapsed, elapsed, ordered, overlaps
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=5, help="updates per chat")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated API latency in seconds")
+    parser.add_argument("--limits", default="1,4,16,64,256")
+    args = parser.parse_args()
+
+    print(f"{args.chats} chats x {args.updates} updates, {args.latency * 1000:.0f} ms per API call")
+    print(f"{'limit':>6} {'updates/s':>10} {'seconds':>8} {'ordered':>8} {'overlaps':>8}")
+    for limit in (int(x) for x in args.limits.split(",")):
+        rate, elapsed, ordered, overlaps = await run(limit, args.chats, args.updates, args.latency)
+        print(f"{limit:>6} {rate:>10.1f} {elapsed:>8.2f} {str(ordered):>8} {overlaps:>8}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
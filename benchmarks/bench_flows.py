@@ -0,0 +1,226 @@
+"""Offline load test for the conversation flows in handlers.py.
+
+Usage:
+    python benchmarks/bench_flows.py [--users 2000] [--latency 0.05] [--jitter 0.02]
+                                     [--flows menu,deposit,register,us] [--webhook]
+
+Builds the real application with app.build_application(), with a fake Bot
+API (benchmarks/fake_bot_api.py) that answers every call after an injected
+latency. Thousands of simulated users then run the language menu, deposit
+(photo -> username), register (email -> username) and US flows at the same
+time, each user sending their updates one after another.
+
+Reports handler latency percentiles, updates per second, event loop lag and
+the cost of writing leads. With --webhook the updates are POSTed to the
+embedded webhook server instead and the ack latency is reported.
+
+Everything runs in a temporary directory, so no real leads or state are touched.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeRequest
+
+LANGUAGES = ["eng", "ita", "spa", "ger", "fra"]
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+
+
+class SyntheticUser:
+    def __init__(self, user_id: int):
+        self.user = {"id": user_id, "is_bot": False, "first_name": "User", "username": f"user{user_id}"}
+        self.chat = {"id": user_id, "type": "private"}
+
+    def _message(self, **fields) -> dict:
+        message = {"message_id": next(_message_ids), "date": int(time.time()), "chat": self.chat,
+                   "from": self.user}
+        message.update(fields)
+        return {"update_id": next(_update_ids), "message": message}
+
+    def command(self, text: str) -> dict:
+        return self._message(text=text, entities=[{"type": "bot_command", "offset": 0,
+                                                   "length": len(text.split()[0])}])
+
+    def text(self, text: str) -> dict:
+        return self._message(text=text)
+
+    def photo(self) -> dict:
+        file_id = f"proof{self.user['id']}"
+        return self._message(photo=[{"file_id": file_id, "file_unique_id": file_id, "width": 1080, "height": 1920}])
+
+    def callback(self, data: str) -> dict:
+        query_id = next(_update_ids)
+        return {"update_id": query_id, "callback_query": {
+            "id": str(query_id), "chat_instance": "bench", "data": data, "from": self.user,
+            "message": {"message_id": next(_message_ids), "date": int(time.time()), "chat": self.chat, "text": "menu"}
+        }}
+
+
+def flow_updates(flow: str, user: SyntheticUser, lang: str) -> list:
+    keytos = f"keytos{user.user['id']}"
+    if flow == "menu":
+        return [user.command("/start"), user.callback(lang), user.callback("reset")]
+    if flow == "deposit":
+        return [user.command("/start"), user.callback(lang), user.callback("deposit_proof"), user.photo(),
+                user.text(keytos)]
+    if flow == "register":
+        return [user.command("/start"), user.callback(lang), user.callback("already_registered"),
+                user.text(f"{keytos}@example.com"), user.text(keytos)]
+    if flow == "us":
+        return [user.command("/start"), user.callback("us"), user.text(keytos)]
+    raise ValueError(f"Unknown flow {flow}")
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def monitor_loop_lag(samples: list, interval: float = 0.01):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def run_direct(application, users: list):
+    # Feed updates through the application's update processor, as Application
+    # does for polled updates.
+    from telegram import Update
+    latencies = []
+
+    async def run_user(updates):
+        for data in updates:
+            update = Update.de_json(data, application.bot)
+            started = time.perf_counter()
+            await application.update_processor.process_update(update, application.process_update(update))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(run_user(updates) for updates in users))
+    return latencies
+
+
+async def run_webhook(application, users: list, port: int):
+    import aiohttp
+    from webhook import WebhookServer, SECRET_HEADER
+    server = WebhookServer(application, "bench-secret")
+    await application.start()
+    await server.start("127.0.0.1", port)
+    url = f"http://127.0.0.1:{port}{server.path}"
+    latencies = []
+    connector = aiohttp.TCPConnector(limit=256)
+    async with aiohttp.ClientSession(connector=connector, headers={SECRET_HEADER: "bench-secret"}) as session:
+        async def run_user(updates):
+            for data in updates:
+                started = time.perf_counter()
+                async with session.post(url, json=data) as response:
+                    response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(run_user(updates) for updates in users))
+    # Wait for the queued updates to be handled.
+    idle_checks = 0
+    while idle_checks < 3:
+        await asyncio.sleep(0.05)
+        busy = application.update_queue.qsize() or application.update_processor.active_chats
+        idle_checks = 0 if busy else idle_checks + 1
+    await server.stop()
+    await application.stop()
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Bot API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency in seconds")
+    parser.add_argument("--flows", default="menu,deposit,register,us")
+    parser.add_argument("--concurrency", type=int, help="MAX_CONCURRENT_UPDATES (default: config.py's)")
+    parser.add_argument("--webhook", action="store_true", help="POST updates to the webhook server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    # The settings come from the environment; the stores are created relative to the cwd.
+    workdir = tempfile.mkdtemp(prefix="kroom-bench-")
+    os.chdir(workdir)
+    os.environ.update({
+        "BOT_TOKEN": "123456:bench", "OWNER_CHAT_ID": "-100999", "OWNER_RATE_PER_MINUTE": "1000000",
+        "OWNER_BURST": "1000000", "LEADS_EXPORT_INTERVAL": "3600"
+    })
+    if args.concurrency:
+        os.environ["MAX_CONCURRENT_UPDATES"] = str(args.concurrency)
+    import logging
+    from app import build_application, build_handlers
+    from config import Config
+    logging.getLogger().setLevel(logging.WARNING)
+
+    flows = args.flows.split(",")
+    users = []
+    flow_counts = {}
+    for user_id in range(1, args.users + 1):
+        flow = random.choice(flows)
+        flow_counts[flow] = flow_counts.get(flow, 0) + 1
+        users.append(flow_updates(flow, SyntheticUser(user_id), random.choice(LANGUAGES)))
+    total_updates = sum(len(u) for u in users)
+
+    fake_api = FakeRequest(args.latency, args.jitter)
+    config = Config()
+    handlers = build_handlers(config)
+    application = build_application(config, handlers, request=fake_api, get_updates_request=FakeRequest())
+    await application.initialize()
+    await application.post_init(application)
+
+    lag = []
+    lag_task = asyncio.create_task(monitor_loop_lag(lag))
+    started = time.perf_counter()
+    if args.webhook:
+        latencies = await run_webhook(application, users, args.port)
+    else:
+        latencies = await run_direct(application, users)
+    elapsed = time.perf_counter() - started
+    lag_task.cancel()
+
+    persist_started = time.perf_counter()
+    await application.update_persistence()
+    persist_elapsed = time.perf_counter() - persist_started
+    await application.post_stop(application)
+    await application.post_shutdown(application)
+    await application.shutdown()
+    leads = handlers.lead_writer.stats()
+
+    ms = lambda seconds: f"{seconds * 1000:.1f} ms"
+    print(f"users: {args.users} ({', '.join(f'{f}={n}' for f, n in sorted(flow_counts.items()))})")
+    print(f"mode: {'webhook' if args.webhook else 'direct'}, Bot API latency {ms(args.latency)} "
+          f"+ up to {ms(args.jitter)}, concurrency {config.max_concurrent_updates}")
+    print(f"updates: {total_updates} in {elapsed:.2f} s = {total_updates / elapsed:.0f} updates/s")
+    label = "webhook ack latency" if args.webhook else "handler latency"
+    print(f"{label}: p50 {ms(percentile(latencies, 50))}, p95 {ms(percentile(latencies, 95))}, "
+          f"p99 {ms(percentile(latencies, 99))}, max {ms(max(latencies))}")
+    print(f"event loop lag: p50 {ms(percentile(lag, 50))}, p99 {ms(percentile(lag, 99))}, "
+          f"max {ms(max(lag) if lag else 0)}")
+    per_lead = leads["avg_flush_ms"] * leads["flushes"] / leads["leads_written"] if leads["leads_written"] else 0
+    print(f"lead writes: {leads['leads_written']} leads in {leads['flushes']} flushes, "
+          f"avg flush {leads['avg_flush_ms']} ms, max {leads['max_flush_ms']} ms, {per_lead:.3f} ms/lead")
+    print(f"state persistence: {ms(persist_elapsed)} for the final run")
+    print(f"Bot API calls: {sum(fake_api.calls.values())} "
+          f"({', '.join(f'{k}={v}' for k, v in sorted(fake_api.calls.items()))}), "
+          f"{sum(fake_api.calls.values()) / total_updates:.2f} per update")
+    print(f"workdir: {workdir}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,156 @@
+"""Bot API connection pool sizes against a local fake Bot API server.
+
+Usage: python benchmarks/bench_pool.py [--pools 4,16,64,256] [--users 500] [--latency 0.05]
+                                       [--jitter 0.02] [--pool-timeout 10]
+
+Unlike the other benchmarks, calls go over real HTTP: an aiohttp server on
+localhost answers the Bot API methods with canned results
+(fake_bot_api.fake_result) after an injected latency. For every pool size,
+--users simulated users run one funnel step each at the same time, with the
+calls a step makes (two delete_message, send_media_group with the sample
+screenshots, send_message, edit_message_text and the owner notification), one
+after another, through an InstrumentedRequest built like the bot's (app.py).
+
+Reports step and call latency percentiles, the time calls waited for a free
+connection (bot_api_pool_wait_seconds), pool timeouts and how many TCP
+connections the server saw. HTTP/2 can't be compared here: the aiohttp server
+only speaks HTTP/1.1.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_flows import percentile
+from fake_bot_api import fake_result
+
+TOKEN = "123456:bench"
+SAMPLES = ["https://example.com/sample_pc.jpg", "https://example.com/sample_phone.jpg"]
+
+
+class FakeBotApiServer:
+    """aiohttp server answering POST /bot<token>/<method> like the Bot API."""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.connections = set()
+        self._runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+        params = dict(await request.post())
+        self.calls += 1
+        self.connections.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(self.latency + random.random() * self.jitter)
+        return web.json_response({"ok": True, "result": fake_result(request.match_info["method"], params)})
+
+    async def start(self, port: int):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+async def funnel_step(bot, chat_id: int, call_latencies: list):
+    # The calls of the busiest funnel steps, as the handlers make them.
+    from telegram import InputMediaPhoto
+    calls = [
+        lambda: bot.delete_message(chat_id, 1),
+        lambda: bot.delete_message(chat_id, 2),
+        lambda: bot.send_media_group(chat_id, [InputMediaPhoto(url) for url in SAMPLES]),
+        lambda: bot.send_message(chat_id, "Please send a photo as proof of deposit"),
+        lambda: bot.edit_message_text("Please enter your Keytos username", chat_id, 3),
+        lambda: bot.send_message(-100999, f"New Contact:\nUser ID: {chat_id}"),
+    ]
+    for call in calls:
+        started = time.perf_counter()
+        await call()
+        call_latencies.append(time.perf_counter() - started)
+
+
+async def run(pool_size: int, args, server: FakeBotApiServer) -> dict:
+    import metrics
+    from telegram import Bot
+    from telegram.error import TimedOut
+    from app import build_request
+    from config import Config
+
+    config = Config({"BOT_TOKEN": TOKEN, "OWNER_CHAT_ID": "-100999",
+                     "API_POOL_TIMEOUT": str(args.pool_timeout)})
+    pool = f"pool{pool_size}"
+    bot = Bot(TOKEN, base_url=f"http://127.0.0.1:{args.port}/bot", request=build_request(config, pool, pool_size))
+    server.connections.clear()
+    step_latencies, call_latencies, failed = [], [], 0
+
+    async def user(chat_id):
+        nonlocal failed
+        started = time.perf_counter()
+        try:
+            await funnel_step(bot, chat_id, call_latencies)
+        except TimedOut:
+            failed += 1
+            return
+        step_latencies.append(time.perf_counter() - started)
+
+    async with bot:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(chat_id) for chat_id in range(1, args.users + 1)))
+        elapsed = time.perf_counter() - started
+    counts, wait_total = metrics.API_POOL_WAIT.values[(pool,)]
+    return {
+        "pool": pool_size,
+        "elapsed": elapsed,
+        "steps": step_latencies,
+        "calls": call_latencies,
+        "mean_wait": wait_total / sum(counts),
+        "timeouts": metrics.API_POOL_TIMEOUTS.values.get((pool,), 0),
+        "failed": failed,
+        "connections": len(server.connections),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pools", default="4,16,64,256", help="comma-separated connection pool sizes")
+    parser.add_argument("--users", type=int, default=500, help="users running a funnel step at the same time")
+    parser.add_argument("--latency", type=float, default=0.05, help="Bot API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency in seconds")
+    parser.add_argument("--pool-timeout", type=float, default=10, help="API_POOL_TIMEOUT in seconds")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = FakeBotApiServer(args.latency, args.jitter)
+    await server.start(args.port)
+    ms = lambda seconds: f"{seconds * 1000:.0f} ms"
+    print(f"{args.users} users x 6 calls, Bot API latency {ms(args.latency)} + up to {ms(args.jitter)}, "
+          f"pool timeout {args.pool_timeout:g} s")
+    print(f"{'pool':>5} {'calls/s':>8} {'step p50':>9} {'step p99':>9} {'call p50':>9} {'call p99':>9} "
+          f"{'avg wait':>9} {'timeouts':>8} {'conns':>6}")
+    try:
+        for pool_size in [int(n) for n in args.pools.split(",")]:
+            r = await run(pool_size, args, server)
+            print(f"{r['pool']:>5} {len(r['calls']) / r['elapsed']:>8.0f} {ms(percentile(r['steps'], 50)):>9} "
+                  f"{ms(percentile(r['steps'], 99)):>9} {ms(percentile(r['calls'], 50)):>9} "
+                  f"{ms(percentile(r['calls'], 99)):>9} {ms(r['mean_wait']):>9} {r['timeouts']:>8} "
+                  f"{r['connections']:>6}")
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+"""Multi-process webhook mode (shards.py) against a local fake update source.
+
+Usage: python benchmarks/bench_shards.py [--workers 1,2,4] [--users 2000] [--duplicates 50]
+                                         [--latency 0.05] [--jitter 0.02]
+
+For each worker count, the sharded webhook server and its worker processes
+are started in a temporary directory with a fake Bot API
+(benchmarks/fake_bot_api.py). Synthetic users (see bench_flows.py) then POST
+their flows to the webhook at the same time. Once LEAD_INDEX_REFRESH has
+passed, --duplicates new users submit Keytos usernames already saved by US
+flow leads, often through another worker.
+
+Reports updates per second and checks that the workers shared their stores
+correctly: every lead saved exactly once with no torn or repeated rows, a
+state row for every user, workbooks matching the CSV files, and the
+cross-worker duplicates caught.
+"""
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_flows import LANGUAGES, SyntheticUser, flow_updates
+from fake_bot_api import FakeRequest
+
+SECRET = "bench-secret"
+LEAD_FLOWS = {"deposit", "register", "us"}
+
+
+async def wait_ready(session, ports: list):
+    # Workers start their metrics server once post_init has run.
+    for port in ports:
+        while True:
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    if response.status == 200:
+                        break
+            except OSError:
+                pass
+            await asyncio.sleep(0.05)
+
+
+async def post_all(session, url: str, users: list):
+    async def run_user(updates):
+        for data in updates:
+            async with session.post(url, json=data) as response:
+                response.raise_for_status()
+
+    await asyncio.gather(*(run_user(updates) for updates in users))
+
+
+def check_stores(workdir: str, expected_keytos: set, duplicates: list, users: int, workers: int) -> list:
+    from lead_store import HEADERS, LeadStore
+    from openpyxl import load_workbook
+    problems = []
+    store = LeadStore(os.path.join(workdir, "leads"))
+    saved = Counter()
+    for day in store.days():
+        rows = list(store.iter_rows(day))
+        for row in rows:
+            if row == HEADERS or len(row) != len(HEADERS):
+                problems.append(f"{day}: bad row {row}")
+            saved[row[2]] += 1
+        wb = load_workbook(store.excel_path(day), read_only=True)
+        excel_rows = sum(1 for _ in wb.active.iter_rows(min_row=2))
+        wb.close()
+        if excel_rows != len(rows):
+            problems.append(f"{day}: workbook has {excel_rows} rows, CSV {len(rows)}")
+    missing = expected_keytos - set(saved)
+    repeated = [name for name, n in saved.items() if n > 1]
+    if missing:
+        problems.append(f"{len(missing)} leads missing")
+    if repeated:
+        problems.append(f"{len(repeated)} leads saved more than once, e.g. {repeated[0]}")
+    cross = sum(1 for new_id, old_id in duplicates if new_id % workers != old_id % workers)
+    print(f"  duplicates: {len(duplicates)} submitted ({cross} through another worker), "
+          f"{len(repeated)} saved again")
+    db = sqlite3.connect(os.path.join(workdir, "bot_state.sqlite3"))
+    states = db.execute("SELECT COUNT(*) FROM user_data").fetchone()[0]
+    db.close()
+    if states != users:
+        problems.append(f"{states} users in the state database, expected {users}")
+    return problems
+
+
+async def run(workers: int, args, users: list, duplicates: list, expected_keytos: set) -> float:
+    import aiohttp
+    from shards import ShardPool, ShardedWebhookServer
+    workdir = tempfile.mkdtemp(prefix=f"kroom-shards-{workers}-")
+    os.chdir(workdir)
+    metrics_port = args.port + 1
+    os.environ.update({
+        "BOT_TOKEN": "123456:bench", "OWNER_CHAT_ID": "-100999", "OWNER_RATE_PER_MINUTE": "1000000",
+        "OWNER_BURST": "1000000", "LEADS_EXPORT_INTERVAL": "3600", "BOT_MODE": "webhook",
+        "WEBHOOK_URL": "http://127.0.0.1", "WEBHOOK_SECRET": SECRET, "WORKERS": str(workers),
+        "METRICS_PORT": str(metrics_port), "LEAD_INDEX_REFRESH": str(args.refresh)
+    })
+    pool = ShardPool(workers, functools.partial(FakeRequest, args.latency, args.jitter), logging.WARNING)
+    server = ShardedWebhookServer(pool, SECRET)
+    pool.start()
+    await server.start("127.0.0.1", args.port)
+    url = f"http://127.0.0.1:{args.port}{server.path}"
+    connector = aiohttp.TCPConnector(limit=256)
+    async with aiohttp.ClientSession(connector=connector, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) \
+            as session:
+        await wait_ready(session, [metrics_port + shard for shard in range(workers)])
+        started = time.perf_counter()
+        await post_all(session, url, users)
+        acked = time.perf_counter() - started
+        # Give the workers time to index each other's leads.
+        pause = args.refresh * 2 + 1 if duplicates else 0
+        if duplicates:
+            await asyncio.sleep(pause)
+            await post_all(session, url, [updates for updates, _ in duplicates])
+    await server.stop()
+    await pool.stop()
+    elapsed = time.perf_counter() - started - pause
+    from lead_store import LeadStore
+    LeadStore().compact()
+
+    total = sum(len(u) for u in users) + sum(len(u) for u, _ in duplicates)
+    print(f"workers: {workers}")
+    print(f"  updates: {total}, acked in {acked:.2f} s, handled in {elapsed:.2f} s incl. shutdown "
+          f"= {total / elapsed:.0f} updates/s")
+    print(f"  routed per worker: {server.pool.routed}")
+    problems = check_stores(workdir, expected_keytos, [ids for _, ids in duplicates],
+                            len(users) + len(duplicates), workers)
+    print("  stores: " + ("OK" if not problems else "; ".join(problems)))
+    print(f"  workdir: {workdir}")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to compare")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--duplicates", type=int, default=50,
+                        help="users re-submitting a saved Keytos username after the first wave")
+    parser.add_argument("--latency", type=float, default=0.05, help="Bot API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random latency in seconds")
+    parser.add_argument("--refresh", type=float, default=1, help="LEAD_INDEX_REFRESH in seconds")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    flows = ["menu", "deposit", "register", "us"]
+    users, expected_keytos, us_keytos = [], set(), set()
+    for user_id in range(1, args.users + 1):
+        flow = random.choice(flows)
+        users.append(flow_updates(flow, SyntheticUser(user_id), random.choice(LANGUAGES)))
+        if flow in LEAD_FLOWS:
+            expected_keytos.add(f"keytos{user_id}")
+        if flow == "us":
+            us_keytos.add(f"keytos{user_id}")
+    # Only a repeat of the same flow is a duplicate; a lead of another flow is saved.
+    duplicates = []
+    for i, old_name in enumerate(random.sample(sorted(us_keytos), min(args.duplicates, len(us_keytos)))):
+        user = SyntheticUser(args.users + 1 + i)
+        updates = [user.command("/start"), user.callback("us"), user.text(old_name)]
+        duplicates.append((updates, (user.user["id"], int(old_name[len("keytos"):]))))
+
+    for workers in [int(n) for n in args.workers.split(",")]:
+        asyncio.run(run(workers, args, users, duplicates, expected_keytos))
+
+
+if __name__ == '__main__':
+    main()
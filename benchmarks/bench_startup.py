@@ -0,0 +1,127 @@
+"""Cold-start time of the bot process.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 15] [--module app]
+
+Every run starts a fresh interpreter, as a new container would:
+
+- `python -X importtime -c "import <module>"` gives the import time of the
+  module and everything it pulls in; the slowest imports are listed by their
+  own (self) time, and the heavy optional dependencies that should stay off
+  the startup path (openpyxl, Pillow, aiohttp, dotenv) are checked.
+- a second interpreter goes all the way to "ready": import, build the
+  application and run initialize() and post_init() against the fake Bot API
+  (benchmarks/fake_bot_api.py), in a temporary directory. Its leads/ holds
+  copies of the repo's legacy workbooks (days saved as .xlsx before the CSV
+  store), like a deployed bot's: the first start converts them to CSV, and
+  later starts shouldn't need openpyxl at all.
+
+Medians over --runs are reported.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+# Should only be imported when the feature using them runs.
+LAZY_MODULES = ["openpyxl", "PIL", "aiohttp", "dotenv"]
+
+READY_SCRIPT = """
+import asyncio, sys, time
+started = time.perf_counter()
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+from app import build_application
+from config import Config
+from fake_bot_api import FakeRequest
+imported = time.perf_counter()
+
+async def ready():
+    application = build_application(Config(), request=FakeRequest(0, 0), get_updates_request=FakeRequest(0, 0))
+    await application.initialize()
+    await application.post_init(application)
+    built = time.perf_counter()
+    openpyxl_loaded = "openpyxl" in sys.modules
+    await application.post_stop(application)
+    await application.post_shutdown(application)
+    await application.shutdown()
+    return built, openpyxl_loaded
+
+built, openpyxl_loaded = asyncio.run(ready())
+print(imported - started, built - started, int(openpyxl_loaded))
+"""
+
+
+def import_times(module: str) -> dict:
+    # {module: (self seconds, cumulative seconds)} from one -X importtime run.
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us) / 1e6, int(cumulative_us) / 1e6)
+    return times
+
+
+def ready_time(workdir: str) -> tuple:
+    env = dict(os.environ, BOT_TOKEN="123456:bench", OWNER_CHAT_ID="-100999", LEADS_EXPORT_INTERVAL="3600")
+    script = READY_SCRIPT.format(root=ROOT, benchmarks=BENCHMARKS)
+    result = subprocess.run([sys.executable, "-c", script], cwd=workdir, env=env, capture_output=True, text=True,
+                            check=True)
+    imported, ready, openpyxl_loaded = result.stdout.split()
+    return float(imported), float(ready), openpyxl_loaded == "1"
+
+
+def copy_legacy_workbooks(workdir: str) -> int:
+    source = os.path.join(ROOT, "leads")
+    names = [name for name in os.listdir(source) if name.endswith(".xlsx")] if os.path.isdir(source) else []
+    os.makedirs(os.path.join(workdir, "leads"))
+    for name in names:
+        shutil.copy2(os.path.join(source, name), os.path.join(workdir, "leads", name))
+    return len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest imports to list")
+    parser.add_argument("--module", default="app", help="module to import, e.g. app or bot")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    totals = [times[args.module][1] for times in runs]
+    print(f"import {args.module}: median {statistics.median(totals) * 1000:.1f} ms, "
+          f"min {min(totals) * 1000:.1f} ms over {args.runs} runs")
+
+    # Self time per module, median over the runs.
+    names = set.intersection(*(set(times) for times in runs))
+    self_times = {name: statistics.median(times[name][0] for times in runs) for name in names}
+    print("\nSlowest imports (self time)")
+    for name, seconds in sorted(self_times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {seconds * 1000:>7.1f} ms  {name}")
+
+    print("\nOptional dependencies on the startup path")
+    for name in LAZY_MODULES:
+        loaded = name in runs[0]
+        print(f"  {name:<10} {'IMPORTED' if loaded else 'not imported'}")
+
+    workdir = tempfile.mkdtemp(prefix="kroom-startup-")
+    workbooks = copy_legacy_workbooks(workdir)
+    _, first, first_openpyxl = ready_time(workdir)
+    ready = [ready_time(workdir) for _ in range(args.runs)]
+    print(f"\nready (import + build + initialize + post_init), {workbooks} legacy workbooks in leads/")
+    print(f"  first start: {first * 1000:.1f} ms, openpyxl {'IMPORTED' if first_openpyxl else 'not imported'}")
+    print(f"  later starts: median {statistics.median(r for _, r, _ in ready) * 1000:.1f} ms "
+          f"(imports {statistics.median(i for i, _, _ in ready) * 1000:.1f} ms), openpyxl "
+          f"{'IMPORTED' if any(loaded for _, _, loaded in ready) else 'not imported'}")
+    print(f"workdir: {workdir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Fake Bot API for benchmarks: canned responses with injected latency."""
+import asyncio
+import itertools
+import json
+import random
+from telegram.request import BaseRequest
+
+# Message ids are numbered per chat, as Telegram does for private chats.
+_message_ids = {}
+
+
+def _photo(file_id):
+    return [{"file_id": file_id, "file_unique_id": file_id, "width": 1280, "height": 720}]
+
+
+def fake_result(endpoint: str, params: dict):
+    """The `result` Telegram would return for a call to `endpoint`."""
+    chat_id = int(params.get("chat_id", 1))
+    message_ids = _message_ids.setdefault(chat_id, itertools.count(1_000_000))
+    message = {"message_id": next(message_ids), "date": 0, "chat": {"id": chat_id, "type": "private"}}
+    if endpoint == "getMe":
+        return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+    if endpoint == "getUpdates":
+        return []
+    if endpoint == "sendPhoto":
+        return dict(message, photo=_photo(f"photo{message['message_id']}"))
+    if endpoint == "sendMediaGroup":
+        media = params["media"]
+        if isinstance(media, str):
+            media = json.loads(media)
+        return [dict(message, message_id=message["message_id"] if i == 0 else next(message_ids),
+                     photo=_photo(f"sample{i}"))
+                for i in range(len(media))]
+    if endpoint in ("sendMessage", "editMessageText"):
+        return dict(message, text=params.get("text", ""))
+    return True
+
+
+class FakeRequest(BaseRequest):
+    """BaseRequest that answers every Bot API call locally.
+
+    Each call sleeps `latency` seconds (plus up to `jitter` seconds) before
+    returning, to stand in for the round trip to api.telegram.org. With
+    record=True every call except getUpdates is also kept in `transcript` as
+    (method, parameters), e.g. to compare two versions of the handlers.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, record: bool = False):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = {}
+        self.transcript = [] if record else None
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        delay = self.latency + random.random() * self.jitter
+        if endpoint == "getUpdates":
+            delay = max(delay, 1.0)
+        if delay:
+            await asyncio.sleep(delay)
+        params = request_data.parameters if request_data else {}
+        if self.transcript is not None and endpoint != "getUpdates":
+            self.transcript.append((endpoint, params))
+        return 200, json.dumps({"ok": True, "result": fake_result(endpoint, params)}).encode()
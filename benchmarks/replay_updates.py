@@ -0,0 +1,161 @@
+"""Replay recorded updates through the bot, for regression and performance tests.
+
+Usage:
+    python benchmarks/replay_updates.py updates.jsonl... [--transcript calls.jsonl] [--expect calls.jsonl]
+    python benchmarks/replay_updates.py --synthetic 2000 [--concurrent] [--latency 0.05]
+
+updates.jsonl holds one update per line as Telegram sends it, e.g. recorded
+with UPDATE_LOG=updates.jsonl (with WORKERS > 1, pass every worker's
+updates.jsonl.N; each chat's updates are in one file); --synthetic generates users running the flows
+of bench_flows.py instead. The updates go through the real application (from
+app.build_application) with the fake Bot API of fake_bot_api.py, in a
+temporary directory.
+
+By default updates are replayed one at a time and owner digests are off, so
+each chat gets the same Bot API calls in the same order on every run:
+--transcript writes them as JSON lines, chat by chat, and --expect compares
+them with an earlier transcript, e.g. one written before a change to the
+handlers. --concurrent replays the chats at the same time
+(each chat's updates in order) to measure throughput instead.
+
+The throttle is turned off unless --throttle is given, since replaying at
+full speed would trip it where the live updates didn't.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_flows import LANGUAGES, SyntheticUser, flow_updates, percentile
+from fake_bot_api import FakeRequest
+
+# Lead timestamps (e.g. in duplicate warnings) change from run to run.
+TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+def load_updates(args) -> list:
+    if args.synthetic:
+        random.seed(args.seed)
+        updates = []
+        for user_id in range(1, args.synthetic + 1):
+            flow = random.choice(["menu", "deposit", "register", "us"])
+            updates += flow_updates(flow, SyntheticUser(user_id), random.choice(LANGUAGES))
+        return updates
+    updates = []
+    for path in args.logs:
+        with open(path, encoding="utf-8") as f:
+            updates += [json.loads(line) for line in f if line.strip()]
+    return updates
+
+
+def by_chat(updates: list) -> list:
+    from shards import shard_key
+    chats = {}
+    for data in updates:
+        chats.setdefault(shard_key(data), []).append(data)
+    return list(chats.values())
+
+
+def compare(transcript: list, path: str) -> bool:
+    with open(path, encoding="utf-8") as f:
+        expected = [line.rstrip("\n") for line in f]
+    for i, (got, want) in enumerate(zip(transcript, expected)):
+        if got != want:
+            print(f"transcript differs at call {i + 1}:\n  expected {want}\n  got      {got}")
+            return False
+    if len(transcript) != len(expected):
+        print(f"transcript has {len(transcript)} calls, expected {len(expected)}")
+        return False
+    print(f"transcript matches {path} ({len(expected)} calls)")
+    return True
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("logs", nargs="*", help="recorded updates, one JSON object per line")
+    parser.add_argument("--synthetic", type=int, help="generate this many synthetic users instead")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrent", action="store_true", help="replay the chats at the same time")
+    parser.add_argument("--latency", type=float, default=0.0, help="Bot API latency in seconds")
+    parser.add_argument("--throttle", action="store_true", help="keep the per-user throttle on")
+    parser.add_argument("--transcript", help="write the Bot API calls made to this file")
+    parser.add_argument("--expect", help="compare the Bot API calls made with this transcript")
+    args = parser.parse_args()
+    if not args.logs and not args.synthetic:
+        parser.error("give a log file or --synthetic")
+    updates = load_updates(args)
+
+    workdir = tempfile.mkdtemp(prefix="kroom-replay-")
+    os.chdir(workdir)
+    os.environ.update({
+        "BOT_TOKEN": "123456:bench", "OWNER_CHAT_ID": "-100999", "OWNER_RATE_PER_MINUTE": "1000000",
+        "OWNER_BURST": "1000000", "OWNER_DIGEST": "0", "LEADS_EXPORT_INTERVAL": "3600"
+    })
+    if not args.throttle:
+        os.environ.update({"USER_RATE_PER_MINUTE": "1e9", "START_DEBOUNCE": "0", "CALLBACK_DEBOUNCE": "0"})
+    import logging
+    from telegram import Update
+    from app import build_application, build_handlers
+    from config import Config
+    logging.getLogger().setLevel(logging.WARNING)
+
+    config = Config()
+    fake_api = FakeRequest(args.latency, record=not args.concurrent)
+    application = build_application(config, build_handlers(config), request=fake_api,
+                                    get_updates_request=FakeRequest())
+    await application.initialize()
+    await application.post_init(application)
+    latencies = []
+
+    async def replay(chat_updates):
+        for data in chat_updates:
+            update = Update.de_json(data, application.bot)
+            started = time.perf_counter()
+            await application.update_processor.process_update(update, application.process_update(update))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    if args.concurrent:
+        await asyncio.gather(*(replay(chat_updates) for chat_updates in by_chat(updates)))
+    else:
+        await replay(updates)
+    elapsed = time.perf_counter() - started
+    # Owner notifications are sent in the background; let them go out before comparing.
+    await application.post_stop(application)
+    await application.post_shutdown(application)
+    await application.shutdown()
+
+    ms = lambda seconds: f"{seconds * 1000:.2f} ms"
+    print(f"updates: {len(updates)} in {elapsed:.2f} s = {len(updates) / elapsed:.0f} updates/s "
+          f"({'concurrent' if args.concurrent else 'one at a time'})")
+    print(f"latency: p50 {ms(percentile(latencies, 50))}, p99 {ms(percentile(latencies, 99))}, "
+          f"max {ms(max(latencies, default=0))}")
+    print(f"Bot API calls: {sum(fake_api.calls.values())} "
+          f"({', '.join(f'{k}={v}' for k, v in sorted(fake_api.calls.items()))})")
+    print(f"workdir: {workdir}")
+    if fake_api.transcript is None:
+        return 0
+    # Owner notifications go out in the background, so only the order within a chat is fixed.
+    calls = sorted(fake_api.transcript, key=lambda call: str(call[1].get("chat_id", "")))
+    transcript = [TIMESTAMP_RE.sub("<time>", json.dumps({"method": method, **params}, sort_keys=True,
+                                                         ensure_ascii=False, default=str))
+                  for method, params in calls]
+    if args.transcript:
+        with open(args.transcript, "w", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in transcript)
+    if args.expect and not compare(transcript, args.expect):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
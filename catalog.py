@@ -0,0 +1,90 @@
+import json
+import os
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+
+
+class Catalog:
+    """Localized messages and reply keyboards, built once at startup.
+
+    locales/languages.json lists the languages, their flags, fallbacks and the
+    language menu; locales/<lang>.json holds each language's messages. Missing
+    keys are filled from the fallback language and every language must end up
+    with every key of the default language. Handlers then only do dict lookups
+    for texts and reuse the same (immutable) keyboards.
+    """
+
+    def __init__(self, manifest: dict, messages: dict):
+        self.default = manifest["default"]
+        self.languages = manifest["languages"]
+        self.flags = {lang: info.get("flag", "") for lang, info in self.languages.items()}
+        self.texts = {lang: self._resolve(lang, messages) for lang in self.languages}
+        self._validate()
+        self._render()
+        self.language_menu = InlineKeyboardMarkup([
+            [InlineKeyboardButton(self.languages[lang].get("menu_label", self.flags[lang]), callback_data=lang)
+             for lang in row]
+            for row in manifest["menu"]
+        ])
+        self.menu_choices = frozenset(lang for row in manifest["menu"] for lang in row)
+        self.markups = {lang: self._build_markups(texts) for lang, texts in self.texts.items()}
+
+    @classmethod
+    def load(cls, folder: str = LOCALES_DIR) -> "Catalog":
+        with open(os.path.join(folder, "languages.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        messages = {}
+        for lang in manifest["languages"]:
+            with open(os.path.join(folder, f"{lang}.json"), encoding="utf-8") as f:
+                messages[lang] = json.load(f)
+        return cls(manifest, messages)
+
+    def _resolve(self, lang: str, messages: dict) -> dict:
+        # Walk the fallback chain, letting each language override its fallback.
+        chain = []
+        while lang and lang not in chain:
+            chain.append(lang)
+            lang = self.languages[lang].get("fallback")
+        texts = {}
+        for lang in reversed(chain):
+            texts.update(messages[lang])
+        return texts
+
+    def _validate(self):
+        required = set(self.texts[self.default])
+        problems = []
+        for lang, texts in self.texts.items():
+            missing = required - set(texts)
+            unknown = set(texts) - required
+            if missing:
+                problems.append(f"{lang} is missing {sorted(missing)}")
+            if unknown:
+                problems.append(f"{lang} has unknown keys {sorted(unknown)}")
+        if problems:
+            raise ValueError("Invalid locales: " + "; ".join(problems))
+
+    def _render(self):
+        for texts in self.texts.values():
+            texts["invalid_photo_reset"] = texts["invalid_photo_reset"].format(reset_button=texts["reset_button"])
+
+    @staticmethod
+    def _build_markups(texts: dict) -> dict:
+        reset_row = [InlineKeyboardButton(texts["reset_button"], callback_data="reset")]
+        return {
+            "options": InlineKeyboardMarkup([
+                [InlineKeyboardButton(texts["deposit_proof_button"], callback_data="deposit_proof"),
+                 InlineKeyboardButton(texts["already_registered_button"], callback_data="already_registered")],
+                reset_row
+            ]),
+            "reset": InlineKeyboardMarkup([reset_row])
+        }
+
+    def text(self, lang: str, key: str) -> str:
+        return self.texts.get(lang, self.texts[self.default])[key]
+
+    def markup(self, lang: str, name: str) -> InlineKeyboardMarkup:
+        return self.markups.get(lang, self.markups[self.default])[name]
+
+    def flag(self, lang: str) -> str:
+        return self.flags.get(lang, "")
@@ -0,0 +1,62 @@
+import asyncio
+from telegram.ext import BaseUpdateProcessor
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates of different chats concurrently, one chat at a time.
+
+    Updates for the same chat wait on that chat's lock, so a user's messages
+    and button presses are handled in the order they arrived and conversation
+    state transitions never race. Updates without a chat (e.g. inline queries)
+    are keyed by user instead.
+
+    The chat lock is taken before a handler slot, so a chat flooding us with
+    updates only ever occupies one of the max_running_updates slots. The
+    base class limit (max_concurrent_updates) bounds how many updates may be
+    running or waiting in total.
+    """
+
+    def __init__(self, max_running_updates: int, max_pending_updates: int = 4096):
+        super().__init__(max(max_pending_updates, max_running_updates))
+        self.max_running_updates = max_running_updates
+        self._slots = asyncio.Semaphore(max_running_updates)
+        # chat key -> [lock, number of updates holding or waiting for it]
+        self._locks = {}
+
+    @staticmethod
+    def _key(update):
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return ("chat", chat.id)
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return ("user", user.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self._key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._locks)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,131 @@
+import importlib.util
+import os
+
+MODES = ("polling", "webhook")
+
+
+class Config:
+    """The bot's settings, read from the environment (and .env).
+
+    Every setting is parsed and checked here, and all problems are reported
+    together in one ValueError instead of the first bad value crashing at
+    import. Modules take a Config instead of reading os.environ themselves, so
+    they can be imported (by tools, benchmarks) without any settings present.
+    """
+
+    def __init__(self, env=None):
+        self._env = os.environ if env is None else env
+        self._errors = []
+
+        self.token = self._str("BOT_TOKEN", required=True)
+        self.owner_chat_id = self._int("OWNER_CHAT_ID", required=True)
+        # "polling" (default) or "webhook".
+        self.mode = self._str("BOT_MODE", "polling")
+        if self.mode not in MODES:
+            self._errors.append(f"BOT_MODE must be one of {', '.join(MODES)}, not {self.mode!r}")
+        # How many updates (from different chats) are handled at the same time.
+        self.max_concurrent_updates = self._int("MAX_CONCURRENT_UPDATES", 64)
+        # SQLite file keeping conversation state across restarts, and how often it's written (seconds).
+        self.state_db = self._str("STATE_DB", "bot_state.sqlite3")
+        self.state_save_interval = self._float("STATE_SAVE_INTERVAL", 5)
+        # Owner chat notifications: messages per minute and how many may go out back to back.
+        self.owner_rate_per_minute = self._float("OWNER_RATE_PER_MINUTE", 20)
+        self.owner_burst = self._int("OWNER_BURST", 5)
+        # Merge text notifications waiting at the same time into one message.
+        self.owner_digest = self._flag("OWNER_DIGEST", True)
+        # Local port serving /metrics (worker N of several uses METRICS_PORT + N).
+        self.metrics_host = self._str("METRICS_HOST", "127.0.0.1")
+        self.metrics_port = self._int("METRICS_PORT", 9090)
+        # Check deposit proofs against earlier ones for recycled screenshots. Needs the optional
+        # Pillow package (pip install Pillow); without it screening stays off.
+        self.proof_screening = self._flag("PROOF_SCREENING", False)
+        self.proof_db = self._str("PROOF_DB", "proofs.sqlite3")
+        # Sample deposit screenshots: bump SAMPLES_VERSION after replacing the images on S3
+        # to make every cached file_id stale; cached file_ids are refreshed after SAMPLES_TTL seconds.
+        self.samples_version = self._str("SAMPLES_VERSION", "1")
+        self.samples_ttl = self._int("SAMPLES_TTL", 7 * 24 * 3600)
+        # Bot API client: outbound calls and getUpdates use separate connection
+        # pools. Timeouts are in seconds; idle connections are kept open for
+        # API_KEEPALIVE_EXPIRY seconds. HTTP/2 needs python-telegram-bot[http2].
+        # Telegram accepts ~30 messages/s per bot, and with more connections
+        # httpx spends more time scheduling them (benchmarks/bench_pool.py).
+        self.api_pool_size = self._int("API_POOL_SIZE", 32)
+        self.get_updates_pool_size = self._int("GET_UPDATES_POOL_SIZE", 1)
+        self.api_pool_timeout = self._float("API_POOL_TIMEOUT", 1)
+        self.api_connect_timeout = self._float("API_CONNECT_TIMEOUT", 5)
+        self.api_read_timeout = self._float("API_READ_TIMEOUT", 5)
+        self.api_write_timeout = self._float("API_WRITE_TIMEOUT", 5)
+        self.api_media_write_timeout = self._float("API_MEDIA_WRITE_TIMEOUT", 20)
+        self.api_keepalive_expiry = self._float("API_KEEPALIVE_EXPIRY", 30)
+        self.api_http2 = self._flag("API_HTTP2", False)
+        if self.api_http2 and importlib.util.find_spec("h2") is None:
+            self._errors.append('API_HTTP2 needs the h2 package: pip install "python-telegram-bot[http2]"')
+        if self.api_pool_size < 1 or self.get_updates_pool_size < 1:
+            self._errors.append("API_POOL_SIZE and GET_UPDATES_POOL_SIZE must be at least 1")
+        # Per-user throttling: updates per minute and burst, and how long (seconds) a
+        # repeated /start or a second press of the same button is ignored.
+        self.user_rate_per_minute = self._float("USER_RATE_PER_MINUTE", 30)
+        self.user_burst = self._int("USER_BURST", 10)
+        self.start_debounce = self._float("START_DEBOUNCE", 3)
+        self.callback_debounce = self._float("CALLBACK_DEBOUNCE", 2)
+        # How often the daily .xlsx files are refreshed from the lead store (seconds).
+        self.leads_export_interval = self._int("LEADS_EXPORT_INTERVAL", 300)
+        # Webhook settings, only used when BOT_MODE is "webhook".
+        webhook = self.mode == "webhook"
+        self.webhook_url = self._str("WEBHOOK_URL", required=webhook)  # public base URL Telegram posts to
+        self.webhook_secret = self._str("WEBHOOK_SECRET", required=webhook)
+        self.webhook_host = self._str("WEBHOOK_HOST", "0.0.0.0")
+        self.webhook_port = self._int("WEBHOOK_PORT", 8080)
+        self.webhook_path = self._str("WEBHOOK_PATH", "/telegram")
+        # Worker processes the webhook updates are sharded across by chat (see shards.py),
+        # and how often (seconds) each one indexes the leads saved by the others.
+        self.workers = self._int("WORKERS", 1)
+        if self.workers < 1 or (self.workers > 1 and not webhook):
+            self._errors.append("WORKERS must be 1, or more with BOT_MODE=webhook")
+        self.lead_index_refresh = self._float("LEAD_INDEX_REFRESH", 2)
+        # Record every incoming update to this file (JSON lines) for
+        # benchmarks/replay_updates.py; with WORKERS > 1 each worker adds its number.
+        self.update_log = self._str("UPDATE_LOG")
+
+        errors, self._errors = self._errors, None
+        if errors:
+            raise ValueError("Invalid configuration:\n  " + "\n  ".join(errors))
+
+    def _str(self, name: str, default: str = None, required: bool = False):
+        value = self._env.get(name) or default
+        if required and not value:
+            self._errors.append(f"{name} is not set")
+        return value
+
+    def _parse(self, name: str, kind, description: str, default, required: bool):
+        value = self._str(name, required=required)
+        if value is None:
+            return default
+        try:
+            return kind(value)
+        except ValueError:
+            self._errors.append(f"{name} must be {description}, not {value!r}")
+            return default
+
+    def _int(self, name: str, default: int = None, required: bool = False):
+        return self._parse(name, int, "an integer", default, required)
+
+    def _float(self, name: str, default: float = None, required: bool = False):
+        return self._parse(name, float, "a number", default, required)
+
+    def _flag(self, name: str, default: bool) -> bool:
+        value = self._env.get(name)
+        return default if value is None else value == "1"
+
+
+_config = None
+
+
+def load_config() -> Config:
+    # Read .env and the environment on first use; later calls get the same Config.
+    global _config
+    if _config is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _config = Config()
+    return _config
@@ -0,0 +1,236 @@
+"""The conversation funnel, defined as data in funnel.json.
+
+States
+    Each state has a persisted id (the ConversationHandler state, so keep
+    them stable across releases) and the transitions taken on input:
+    "callbacks" maps callback data to a transition ("$language" stands for
+    every language of the menu without a key of its own, "*" for any other
+    data), "photo" and "other" handle a photo or any other message, "text" a
+    text message that isn't a command.
+
+Transitions
+    Either inline, or the name of one in "transitions". Their keys run in
+    this order, each one optional:
+
+    require_username  reply "unset_username" and stay if the user has no Telegram username
+    validate/invalid  check the text (e.g. "email"); run `invalid` and stay if it fails
+    lang              set the user's language: a code, or "$arg" for the callback data
+                      or the deep link's language
+    set/store         set user_data values / store the text or photo file_id under a key
+    screen_proof      start screening the photo for a recycled screenshot
+    delete            delete the "command" message and/or replies remembered under these keys
+    samples           send the sample deposit screenshots
+    sink              send the lead to the owner and save it (see Sinks)
+    say/markup        reply with this message (in the user's language, or the
+                      default one with say_in "default") and keyboard ("languages",
+                      "options" or "reset"); callbacks edit their message instead
+    remember          keep the id of the reply in user_data under this key
+    track             count a funnel step: [step] or [step, flow]
+    next              the next state, or "end"; without it the state stays the same
+
+Entry
+    /start runs "start"; /start <lang>_<link> runs links[<link>] (deep
+    links from the channels), any other argument runs "other". "fallbacks"
+    maps commands available in every state to transitions.
+
+Sinks
+    Where a finished flow's lead goes, chosen by user_data["flow"] (or
+    "default_sink"): the title and fields of the owner notification, an
+    optional photo (a user_data key) and whether the proof screening result
+    is added.
+
+Funnel.load() checks the definition against the catalog and compiles it
+into dicts keyed by callback data, link and state, so handling an update is
+a dict lookup followed by a fixed sequence of steps.
+"""
+import json
+import os
+import re
+from telegram.ext import ConversationHandler
+
+FUNNEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "funnel.json")
+
+# Simple regex for email validation
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+
+
+def is_valid_email(email: str) -> bool:
+    return EMAIL_RE.match(email) is not None
+
+
+VALIDATORS = {"email": is_valid_email}
+# Lines of the owner notification, by sink field.
+FIELD_LABELS = {
+    "username": "Username",
+    "user_id": "User ID",
+    "keytos_username": "Keytos Username",
+    "email": "Email",
+    "language": "Language",
+}
+TRANSITION_KEYS = {"require_username", "validate", "invalid", "lang", "set", "store", "screen_proof", "delete",
+                   "samples", "sink", "say", "say_in", "markup", "remember", "track", "next"}
+END = "end"
+
+
+class Transition:
+    __slots__ = ("name", "require_username", "validate", "invalid", "lang", "set", "store", "screen_proof",
+                 "delete", "samples", "sink", "say", "say_in_default", "markup", "remember", "track", "next")
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.require_username = spec.get("require_username", False)
+        self.validate = VALIDATORS.get(spec.get("validate"))
+        self.invalid = spec.get("invalid")  # a Transition once compiled
+        self.lang = spec.get("lang")
+        self.set = spec.get("set", {})
+        self.store = spec.get("store")
+        self.screen_proof = spec.get("screen_proof", False)
+        self.delete = spec.get("delete", [])
+        self.samples = spec.get("samples", False)
+        self.sink = spec.get("sink", False)
+        self.say = spec.get("say")
+        self.say_in_default = spec.get("say_in") == "default"
+        self.markup = spec.get("markup")
+        self.remember = spec.get("remember")
+        self.track = spec.get("track")
+        self.next = spec.get("next")  # a state id, ConversationHandler.END or None once compiled
+
+
+class Sink:
+    __slots__ = ("name", "title", "fields", "photo", "screen_proof")
+
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.title = spec["title"]
+        self.fields = spec["fields"]
+        self.photo = spec.get("photo")
+        self.screen_proof = spec.get("screen_proof", False)
+
+
+class State:
+    __slots__ = ("name", "id", "callbacks", "any_callback", "photo", "other", "text")
+
+    def __init__(self, name: str, state_id: int):
+        self.name = name
+        self.id = state_id
+        self.callbacks = {}
+        self.any_callback = None
+        self.photo = None
+        self.other = None
+        self.text = None
+
+
+class Funnel:
+    """The funnel compiled from its definition, checked against a Catalog."""
+
+    def __init__(self, definition: dict, catalog):
+        self.catalog = catalog
+        self._problems = []
+        self._named = definition.get("transitions", {})
+        self._compiled = {}
+        self.states = {name: State(name, spec.get("id")) for name, spec in definition.get("states", {}).items()}
+        self.sinks = {}
+        for name, spec in definition.get("sinks", {}).items():
+            self._check_sink(name, spec)
+            self.sinks[name] = Sink(name, spec)
+        self.default_sink = self.sinks.get(definition.get("default_sink"))
+        if self.default_sink is None:
+            self._problems.append(f"default_sink must be one of {sorted(self.sinks)}")
+        ids = [state.id for state in self.states.values()]
+        if not all(isinstance(i, int) for i in ids) or len(set(ids)) != len(ids):
+            self._problems.append(f"states need distinct integer ids, got {ids}")
+        for name, spec in definition.get("states", {}).items():
+            self._compile_state(self.states[name], spec)
+        entry = definition.get("entry", {})
+        self.start = self._transition(entry.get("start"), "entry.start", entry=True)
+        self.links = {link: self._transition(spec, f"entry.links.{link}", entry=True)
+                      for link, spec in entry.get("links", {}).items()}
+        self.other_start = self._transition(entry.get("other"), "entry.other", entry=True)
+        self.fallbacks = {command: self._transition(spec, f"fallbacks.{command}", entry=True)
+                          for command, spec in definition.get("fallbacks", {}).items()}
+        if self._problems:
+            raise ValueError("Invalid funnel: " + "; ".join(self._problems))
+
+    @classmethod
+    def load(cls, catalog, path: str = FUNNEL_PATH) -> "Funnel":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), catalog)
+
+    def _compile_state(self, state: State, spec: dict):
+        for data, transition in spec.get("callbacks", {}).items():
+            where = f"states.{state.name}.callbacks.{data}"
+            if data == "*":
+                state.any_callback = self._transition(transition, where)
+            elif data == "$language":
+                compiled = self._transition(transition, where)
+                for lang in self.catalog.menu_choices:
+                    if lang not in spec["callbacks"]:
+                        state.callbacks[lang] = compiled
+            else:
+                state.callbacks[data] = self._transition(transition, where)
+        for kind in ("photo", "other", "text"):
+            if kind in spec:
+                setattr(state, kind, self._transition(spec[kind], f"states.{state.name}.{kind}"))
+        unknown = set(spec) - {"id", "callbacks", "photo", "other", "text"}
+        if unknown:
+            self._problems.append(f"state {state.name} has unknown keys {sorted(unknown)}")
+
+    def _transition(self, spec, where: str, entry: bool = False):
+        # Named transitions are compiled once and shared by every reference.
+        if isinstance(spec, str):
+            if spec in self._compiled:
+                transition = self._compiled[spec]
+            elif spec in self._named:
+                transition = self._compiled[spec] = self._build(spec, self._named[spec])
+            else:
+                self._problems.append(f"{where}: unknown transition {spec!r}")
+                return None
+        elif isinstance(spec, dict):
+            transition = self._build(where, spec)
+        else:
+            self._problems.append(f"{where}: missing transition")
+            return None
+        if entry and transition.next is None:
+            self._problems.append(f"{where}: an entry point needs a next state")
+        return transition
+
+    def _build(self, where: str, spec: dict) -> Transition:
+        transition = Transition(where, spec)
+        unknown = set(spec) - TRANSITION_KEYS
+        if unknown:
+            self._problems.append(f"{where} has unknown keys {sorted(unknown)}")
+        messages = self.catalog.texts[self.catalog.default]
+        if transition.say is not None and transition.say not in messages:
+            self._problems.append(f"{where}: unknown message {transition.say!r}")
+        if transition.require_username and "unset_username" not in messages:
+            self._problems.append(f"{where}: require_username needs the message 'unset_username'")
+        markups = {"languages"} | set(self.catalog.markups[self.catalog.default])
+        if transition.markup is not None and transition.markup not in markups:
+            self._problems.append(f"{where}: markup must be one of {sorted(markups)}")
+        if "validate" in spec and transition.validate is None:
+            self._problems.append(f"{where}: validate must be one of {sorted(VALIDATORS)}")
+        if (transition.validate is None) != (transition.invalid is None):
+            self._problems.append(f"{where}: validate and invalid go together")
+        if transition.invalid is not None:
+            transition.invalid = self._transition(transition.invalid, f"{where}.invalid")
+        if transition.track is not None and not 1 <= len(transition.track) <= 2:
+            self._problems.append(f"{where}: track is [step] or [step, flow]")
+        if transition.next == END:
+            transition.next = ConversationHandler.END
+        elif transition.next is not None:
+            state = self.states.get(transition.next)
+            if state is None:
+                self._problems.append(f"{where}: unknown state {transition.next!r}")
+            transition.next = state.id if state else None
+        return transition
+
+    def _check_sink(self, name: str, spec: dict):
+        if "title" not in spec or not isinstance(spec.get("fields"), list):
+            self._problems.append(f"sink {name} needs a title and fields")
+            return
+        unknown = set(spec["fields"]) - set(FIELD_LABELS)
+        if unknown:
+            self._problems.append(f"sink {name} has unknown fields {sorted(unknown)}")
+
+    def sink(self, flow: str) -> Sink:
+        return self.sinks.get(flow, self.default_sink)
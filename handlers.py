@@ -0,0 +1,234 @@
+import asyncio
+import functools
+import logging
+from telegram import Update
+from telegram.ext import (
+    CallbackQueryHandler, CommandHandler, ContextTypes, ConversationHandler, MessageHandler, filters
+)
+import metrics
+from funnel import FIELD_LABELS
+from metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# The messages each kind of state transition handles, in the order they're tried.
+MESSAGE_FILTERS = [
+    ("photo", filters.PHOTO),
+    ("other", ~filters.PHOTO),
+    ("text", filters.TEXT & ~filters.COMMAND),
+]
+
+
+class BotHandlers:
+    """The conversation's handlers and the services they use.
+
+    Nothing is created at import; app.build_handlers() wires the stores,
+    notifier and caches from a Config, and register_handlers() adds the
+    handlers to an Application. What each update does is looked up in the
+    funnel (funnel.json, see funnel.py) and carried out by run().
+    """
+
+    def __init__(self, catalog, funnel, lead_index, lead_writer, owner_notifier, sample_media,
+                 proof_screener=None):
+        self.catalog = catalog  # localized messages and keyboards
+        self.funnel = funnel  # states, transitions and sinks of the conversation
+        self.lead_index = lead_index  # every saved lead, for duplicate detection
+        self.lead_writer = lead_writer  # leads are queued here and written by a background task
+        self.owner_notifier = owner_notifier  # lead notifications to the owner chat
+        self.sample_media = sample_media  # file_ids of the sample deposit screenshots
+        self.proof_screener = proof_screener
+        self._screened_leads = set()  # tasks submitting leads once their proof is screened
+
+    def track_step(self, context: ContextTypes.DEFAULT_TYPE, step: str, flow: str = ""):
+        # Count a user reaching a funnel step, by language and flow. Deep links can
+        # carry any language, so unknown ones are grouped to keep the labels bounded.
+        lang = context.user_data.get("lang", "eng")
+        metrics.FUNNEL_STEPS.inc(step, lang if lang in self.catalog.languages else "other", flow)
+
+    def save_lead(self, lead: dict):
+        self.lead_writer.enqueue(lead)
+        self.lead_index.add(lead)
+
+    def submit_lead(self, lead: dict, forward_msg: str, photo: str = None):
+        # Notify the owner and save the lead, unless this user, Keytos account or
+        # email already went through the same flow; then the owner is told and
+        # nothing is saved. A lead following one of another flow (e.g. a deposit
+        # after registering) is saved, and flagged to the owner.
+        duplicate, related = self.lead_index.find_earlier(lead)
+        if duplicate:
+            forward_msg = f"⚠️ Already submitted on {duplicate[0]} ({duplicate[3]})\n" + forward_msg
+        elif related:
+            forward_msg = f"ℹ️ Earlier lead on {related[0]} ({related[3]})\n" + forward_msg
+        if photo:
+            self.owner_notifier.notify_photo(photo, forward_msg)
+        else:
+            self.owner_notifier.notify_text(forward_msg)
+        if duplicate:
+            logger.info("Duplicate lead from %s not saved again", lead["telegram_username"])
+        else:
+            self.save_lead(lead)
+
+    @instrumented("start")
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # /start, or /start <lang>_<link> from a deep link.
+        args = update.message.text.split()
+        if len(args) < 2:
+            return await self.run(self.funnel.start, update, context)
+        param = args[1]
+        _, underscore, link = param.rpartition("_")
+        transition = self.funnel.links.get(link) if underscore else None
+        if transition is None:
+            return await self.run(self.funnel.other_start, update, context)
+        return await self.run(transition, update, context, param.split("_")[0])
+
+    async def on_callback(self, state, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+        transition = state.callbacks.get(query.data, state.any_callback)
+        return await self.run(transition, update, context, query.data)
+
+    async def on_message(self, transition, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        return await self.run(transition, update, context)
+
+    async def reply(self, update: Update, text: str, reply_markup=None):
+        # Callbacks edit the message with the buttons; messages get an answer.
+        if update.callback_query:
+            return await update.callback_query.edit_message_text(text, reply_markup=reply_markup)
+        return await update.message.reply_text(text, reply_markup=reply_markup)
+
+    async def run(self, transition, update: Update, context: ContextTypes.DEFAULT_TYPE, arg: str = None):
+        # Carry out a transition (see funnel.py for what each step does) and
+        # return the next state, or None to stay in this one.
+        user_data = context.user_data
+        message = update.message
+        if transition.require_username and not update.effective_user.username:
+            lang = user_data.get("lang", self.catalog.default)
+            await self.reply(update, self.catalog.text(lang, "unset_username"))
+            return None
+        if transition.validate and not transition.validate(message.text.strip()):
+            return await self.run(transition.invalid, update, context, arg)
+        if transition.lang:
+            user_data["lang"] = arg if transition.lang == "$arg" else transition.lang
+        user_data.update(transition.set)
+        if transition.store:
+            user_data[transition.store] = message.photo[-1].file_id if message.photo else message.text.strip()
+        if transition.screen_proof and self.proof_screener:
+            # Runs in the background; the result is picked up when the lead is forwarded.
+            user = update.effective_user
+            username = f"@{user.username}" if user.username else "Not set"
+            self.proof_screener.start(context.bot, message.photo[-1], user.id, username)
+        for key in transition.delete:
+            message_id = message.message_id if key == "command" else user_data.get(key)
+            if message_id:
+                try:
+                    await context.bot.delete_message(chat_id=update.effective_chat.id, message_id=message_id)
+                except Exception as e:
+                    logger.error("Failed to delete %s message: %s", key, e)
+        lang = user_data.get("lang", self.catalog.default)
+        if transition.samples:
+            await self.sample_media.send_samples(context.bot, update.effective_chat.id, lang)
+        if transition.sink:
+            await self.complete(update, context)
+        if transition.say:
+            say_in = self.catalog.default if transition.say_in_default else lang
+            if transition.markup == "languages":
+                reply_markup = self.catalog.language_menu
+            else:
+                reply_markup = self.catalog.markup(say_in, transition.markup) if transition.markup else None
+            sent = await self.reply(update, self.catalog.text(say_in, transition.say), reply_markup)
+            if transition.remember:
+                user_data[transition.remember] = sent.message_id
+        if transition.track:
+            self.track_step(context, *transition.track)
+        return transition.next
+
+    async def complete(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # Send the finished flow's lead to its sink: the owner chat and the lead store.
+        user_data = context.user_data
+        sink = self.funnel.sink(user_data.get("flow"))
+        user = update.effective_user
+        username = f"@{user.username}"  # required before a sink
+        lang = user_data.get("lang", self.catalog.default)
+        values = {
+            "username": username,
+            "user_id": str(user.id),
+            "keytos_username": user_data["keytos_username"],
+            "email": user_data.get("email", ""),
+            "language": self.catalog.flag(lang),
+        }
+        self.track_step(context, "completed", sink.name)
+        forward_msg = "\n".join([sink.title + ":"] + [
+            f"{FIELD_LABELS[field]}:" + (f" {values[field]}" if values[field] else "") for field in sink.fields
+        ])
+        lead = {
+            "telegram_username": username,
+            "keytos_username": values["keytos_username"],
+            "flow": sink.name,
+            "email": values["email"] if "email" in sink.fields else "",
+            "language": lang
+        }
+        photo = user_data.get(sink.photo) if sink.photo else None
+        if sink.screen_proof and self.proof_screener:
+            # The user gets their reply right away; the lead follows once the
+            # screening is done (see finish_leads()).
+            task = asyncio.create_task(self.submit_screened_lead(user.id, lead, forward_msg, photo))
+            self._screened_leads.add(task)
+            task.add_done_callback(self._screened_leads.discard)
+        else:
+            self.submit_lead(lead, forward_msg, photo)
+        logger.info("Forwarded %s lead from %s", sink.name, username)
+
+    async def submit_screened_lead(self, user_id: int, lead: dict, forward_msg: str, photo: str = None):
+        warning = await self.proof_screener.result(user_id)
+        if warning:
+            forward_msg = warning + "\n" + forward_msg
+        self.submit_lead(lead, forward_msg, photo)
+
+    async def finish_leads(self):
+        # Submit the leads still waiting for their proof screening.
+        await asyncio.gather(*self._screened_leads)
+
+    @instrumented("echo")
+    async def echo(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # Instruct user to use /start instead of sending arbitrary texts.
+        await update.message.reply_text("Please type /start to begin the conversation.")
+
+
+def register_handlers(application, handlers: BotHandlers, throttle=None, update_log=None):
+    # Updates are recorded as they arrive, then spam is dropped, before it
+    # reaches the conversation (group 0).
+    if update_log:
+        application.add_handler(update_log.handler(), group=-2)
+    if throttle:
+        application.add_handler(throttle.handler(), group=-1)
+    # The ConversationHandler is generated from the funnel: per state, one
+    # handler for its callbacks and one per kind of message it takes.
+    funnel = handlers.funnel
+    states = {}
+    for state in funnel.states.values():
+        state_handlers = []
+        if state.callbacks or state.any_callback:
+            callback = instrumented(f"{state.name}.callback")(functools.partial(handlers.on_callback, state))
+            pattern = None if state.any_callback else state.callbacks.__contains__
+            state_handlers.append(CallbackQueryHandler(callback, pattern=pattern))
+        for kind, message_filter in MESSAGE_FILTERS:
+            transition = getattr(state, kind)
+            if transition:
+                callback = instrumented(f"{state.name}.{kind}")(functools.partial(handlers.on_message, transition))
+                state_handlers.append(MessageHandler(message_filter, callback))
+        states[state.id] = state_handlers
+    fallbacks = [
+        CommandHandler(command, instrumented(f"{command}_command")(functools.partial(handlers.on_message, transition)))
+        for command, transition in funnel.fallbacks.items()
+    ]
+    conv_handler = ConversationHandler(
+        entry_points=[CommandHandler("start", handlers.start)],
+        states=states,
+        fallbacks=fallbacks,
+        allow_reentry=True,  # Allow /start to be processed even if conversation is active.
+        name="funnel",
+        persistent=True  # Survive restarts; see SQLitePersistence.
+    )
+    application.add_handler(conv_handler)
+    # Replace the echo handler to force /start usage.
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.echo))
@@ -0,0 +1,116 @@
+import argparse
+import logging
+from lead_store import HEADERS, LeadStore, lead_to_row
+
+logger = logging.getLogger(__name__)
+
+
+class LeadIndex:
+    """In-memory index of every saved lead.
+
+    Leads are indexed by Telegram username, Keytos username and lowercased
+    email, so "has this user already submitted?" is a dict lookup instead of
+    a scan over every daily lead file. The index is built from the lead store
+    at startup and kept up to date by add() as new leads are saved.
+
+    When several processes share the store, refresh() picks up the leads the
+    others saved: only the bytes appended to each CSV file since it was last
+    read are parsed.
+    """
+
+    def __init__(self, store: LeadStore):
+        self.store = store
+        self.by_telegram = {}
+        self.by_keytos = {}
+        self.by_email = {}
+        self.size = 0
+        # day -> bytes of its CSV file already indexed.
+        self.offsets = {}
+
+    def rebuild(self):
+        self.by_telegram = {}
+        self.by_keytos = {}
+        self.by_email = {}
+        self.size = 0
+        self.offsets = {}
+        # Legacy workbooks are converted on the first start; after that only CSV is read.
+        self.store.import_workbooks()
+        for day in self.store.days():
+            rows, self.offsets[day] = self.store.read_from(day)
+            self.add_rows(rows)
+        logger.info("Lead index built from %d leads", self.size)
+
+    def read_new(self) -> list:
+        # Rows appended to the store since the last call. Only reads files, so
+        # it can run on a worker thread; add_rows() then indexes the rows.
+        rows = []
+        for day in self.store.days():
+            new_rows, self.offsets[day] = self.store.read_from(day, self.offsets.get(day, 0))
+            rows += new_rows
+        return rows
+
+    def refresh(self):
+        self.add_rows(self.read_new())
+
+    def add(self, lead: dict):
+        self._add_row(lead_to_row(lead))
+
+    def add_rows(self, rows):
+        for row in rows:
+            self._add_row(row)
+
+    def _add_row(self, row: list):
+        row = tuple(row[:len(HEADERS)]) + ("",) * (len(HEADERS) - len(row))
+        date, telegram_username, keytos_username, flow, email, language = row
+        entries = []
+        if telegram_username:
+            entries.append(self.by_telegram.setdefault(telegram_username.lower(), []))
+        if keytos_username:
+            entries.append(self.by_keytos.setdefault(keytos_username, []))
+        if email:
+            entries.append(self.by_email.setdefault(email.lower(), []))
+        # Leads added by this process come back when the files are read again.
+        if entries and row in entries[0]:
+            return
+        for rows in entries:
+            rows.append(row)
+        self.size += 1
+
+    def history(self, telegram_username: str = None, keytos_username: str = None, email: str = None) -> list:
+        # Every lead matching any of the given keys, oldest first.
+        rows = []
+        if telegram_username:
+            rows += self.by_telegram.get(telegram_username.lower(), [])
+        if keytos_username:
+            rows += self.by_keytos.get(keytos_username, [])
+        if email:
+            rows += self.by_email.get(email.lower(), [])
+        return sorted(set(rows))
+
+    def find_earlier(self, lead: dict):
+        # (duplicate, related): the first earlier lead of the same flow sharing the
+        # Telegram username, Keytos username or email, and the first of another flow.
+        duplicate = related = None
+        for row in self.history(lead.get("telegram_username"), lead.get("keytos_username"), lead.get("email")):
+            if row[3] == lead.get("flow", ""):
+                duplicate = duplicate or row
+            else:
+                related = related or row
+        return duplicate, related
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show the saved leads of a user.")
+    parser.add_argument("telegram_username", nargs="?", help="e.g. @someone")
+    parser.add_argument("--keytos", help="Keytos username")
+    parser.add_argument("--email")
+    args = parser.parse_args()
+    if not (args.telegram_username or args.keytos or args.email):
+        parser.error("give a Telegram username, --keytos or --email")
+    index = LeadIndex(LeadStore())
+    index.rebuild()
+    rows = index.history(args.telegram_username, args.keytos, args.email)
+    if not rows:
+        print("No leads found.")
+    for row in rows:
+        print(" | ".join(f"{name}: {value}" for name, value in zip(HEADERS, row) if value))
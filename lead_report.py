@@ -0,0 +1,152 @@
+import argparse
+import csv
+import os
+import sys
+from collections import Counter
+from datetime import date
+from lead_store import HEADERS, LeadStore
+
+# Rows per batch when writing Parquet.
+PARQUET_BATCH = 10000
+
+
+class LeadReport:
+    """Funnel numbers over a range of days, computed in one streaming pass.
+
+    Only counters are kept (per flow, language, hour, and the current day and
+    week), so memory use doesn't grow with the number of days or rows read.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.by_flow = Counter()
+        self.by_language = Counter()
+        self.by_flow_language = Counter()
+        self.by_hour = Counter()
+
+    def add(self, row: list):
+        _, _, _, flow, _, language = row[:len(HEADERS)]
+        self.total += 1
+        self.by_flow[flow] += 1
+        self.by_language[language] += 1
+        self.by_flow_language[(flow, language)] += 1
+        hour = row[0][11:13]
+        if hour:
+            self.by_hour[int(hour)] += 1
+
+
+class MergedWriter:
+    """Writes the merged rows as CSV, .xlsx (write-only mode) or Parquet."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.kind = os.path.splitext(path)[1].lower()
+        if self.kind == ".csv":
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(HEADERS)
+        elif self.kind == ".xlsx":
+            from openpyxl import Workbook
+            self._wb = Workbook(write_only=True)
+            self._ws = self._wb.create_sheet("Leads")
+            self._ws.append(HEADERS)
+        elif self.kind == ".parquet":
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+            self._pa = pyarrow
+            self._schema = pyarrow.schema([(name, pyarrow.string()) for name in HEADERS])
+            self._parquet = pyarrow.parquet.ParquetWriter(path, self._schema)
+            self._batch = []
+        else:
+            raise SystemExit(f"Unsupported output format: {path} (use .csv, .xlsx or .parquet)")
+
+    def write(self, row: list):
+        if self.kind == ".csv":
+            self._csv.writerow(row)
+        elif self.kind == ".xlsx":
+            self._ws.append(row)
+        else:
+            self._batch.append(row)
+            if len(self._batch) >= PARQUET_BATCH:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        if self._batch:
+            columns = [[row[i] for row in self._batch] for i in range(len(HEADERS))]
+            self._parquet.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+            self._batch = []
+
+    def close(self):
+        if self.kind == ".csv":
+            self._file.close()
+        elif self.kind == ".xlsx":
+            self._wb.save(self.path)
+        else:
+            self._flush_parquet()
+            self._parquet.close()
+
+
+def percent(part: int, whole: int) -> str:
+    return f"{part * 100 / whole:.1f}%" if whole else "-"
+
+
+def run_report(store: LeadStore, first_day: str = None, last_day: str = None, output: str = None, out=sys.stdout):
+    report = LeadReport()
+    writer = MergedWriter(output) if output else None
+    week, week_total = None, 0
+
+    print("Leads per day", file=out)
+    for day in store.all_days():
+        if (first_day and day < first_day) or (last_day and day > last_day):
+            continue
+        day_counts = Counter()
+        for row in store.iter_day(day):
+            report.add(row)
+            day_counts[row[3]] += 1
+            if writer:
+                writer.write(row[:len(HEADERS)])
+        day_total = sum(day_counts.values())
+        flows = ", ".join(f"{flow or '-'} {n}" for flow, n in sorted(day_counts.items()))
+        print(f"  {day}  {day_total:>6}  {flows}", file=out)
+
+        # Days come in order, so a week is complete once a later one starts.
+        day_week = "%d-W%02d" % date.fromisoformat(day).isocalendar()[:2]
+        if week and day_week != week:
+            print(f"  week {week}: {week_total}", file=out)
+            week_total = 0
+        week, week_total = day_week, week_total + day_total
+    if week:
+        print(f"  week {week}: {week_total}", file=out)
+    if writer:
+        writer.close()
+
+    print(f"\nTotal leads: {report.total}", file=out)
+    print("\nBy flow (share of all leads)", file=out)
+    for flow, n in report.by_flow.most_common():
+        print(f"  {flow or '-':<14} {n:>6}  {percent(n, report.total)}", file=out)
+    print("\nBy language", file=out)
+    for language, n in report.by_language.most_common():
+        print(f"  {language or '-':<14} {n:>6}  {percent(n, report.total)}", file=out)
+    print("\nBy flow and language (share of the language's leads)", file=out)
+    for (flow, language), n in sorted(report.by_flow_language.items()):
+        print(f"  {flow or '-':<14} {language or '-':<6} {n:>6}  {percent(n, report.by_language[language])}",
+              file=out)
+    print("\nBy hour", file=out)
+    busiest = max(report.by_hour.values(), default=1)
+    for hour in range(24):
+        n = report.by_hour[hour]
+        print(f"  {hour:02d}:00  {n:>6}  {'#' * round(40 * n / busiest)}", file=out)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Funnel report over the daily lead files.")
+    parser.add_argument("--from", dest="first_day", help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="last_day", help="last day, YYYY-MM-DD")
+    parser.add_argument("--output", help="merged leads file: .csv, .xlsx or .parquet")
+    parser.add_argument("--leads-dir", help="defaults to ./leads")
+    args = parser.parse_args()
+    run_report(LeadStore(args.leads_dir), args.first_day, args.last_day, args.output)
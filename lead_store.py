@@ -0,0 +1,206 @@
+import csv
+import io
+import logging
+import os
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; only one process may write the store there.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Columns of every lead file, in order.
+HEADERS = ["Date", "Telegram Username", "Keytos Username", "Flow", "Email", "Language"]
+# Lead files are named after their day, e.g. 2025-08-16.csv.
+LEAD_FILE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.(csv|xlsx)$")
+
+
+class LeadStore:
+    """Append-only lead storage.
+
+    Every lead is appended as one CSV line to leads/YYYY-MM-DD.csv, so saving a
+    lead costs the same no matter how many leads the day already has. The daily
+    .xlsx files are produced from the CSV files by export_excel()/compact().
+
+    Writes take an exclusive lock on leads/.lock and exports a shared one, so
+    several bot processes can share the store without interleaving rows or
+    starting a day's file twice.
+    """
+
+    def __init__(self, folder=None):
+        self.folder = folder or os.path.join(os.getcwd(), "leads")
+
+    def csv_path(self, day: str) -> str:
+        return os.path.join(self.folder, f"{day}.csv")
+
+    def excel_path(self, day: str) -> str:
+        return os.path.join(self.folder, f"{day}.xlsx")
+
+    @contextmanager
+    def _lock(self, shared: bool = False):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def append(self, lead: dict):
+        self.append_many([lead])
+
+    def append_many(self, leads: list):
+        # Group by day so a batch written around midnight lands in the right files.
+        by_day = {}
+        for lead in leads:
+            row = lead_to_row(lead)
+            by_day.setdefault(row[0][:10], []).append(row)
+        with self._lock():
+            for day, rows in by_day.items():
+                path = self.csv_path(day)
+                if not os.path.exists(path):
+                    self._start_day(day)
+                with open(path, "a", newline="", encoding="utf-8") as f:
+                    csv.writer(f).writerows(rows)
+
+    def _start_day(self, day: str):
+        # Write the header, and carry over rows from a workbook saved before the
+        # CSV store existed so the next export doesn't drop them.
+        rows = []
+        excel_path = self.excel_path(day)
+        if os.path.exists(excel_path):
+            rows = list(self.iter_day(day))
+            logger.info("Imported %d rows from %s into the lead store", len(rows), excel_path)
+        with open(self.csv_path(day), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+            writer.writerows(rows)
+
+    def import_workbooks(self) -> list:
+        # Give every day only saved as .xlsx (before the CSV store existed) its
+        # CSV file, once, so reading the store no longer needs openpyxl.
+        legacy = self._days_with("xlsx") - self._days_with("csv")
+        imported = []
+        if not legacy:
+            return imported
+        with self._lock():
+            for day in sorted(legacy):
+                if os.path.exists(self.csv_path(day)):
+                    continue
+                self._start_day(day)
+                # Dated like the workbook, so compact() doesn't rewrite it.
+                mtime = os.path.getmtime(self.excel_path(day))
+                os.utime(self.csv_path(day), (mtime, mtime))
+                imported.append(day)
+        return imported
+
+    def _days_with(self, extension: str) -> set:
+        if not os.path.isdir(self.folder):
+            return set()
+        matches = (LEAD_FILE_RE.match(name) for name in os.listdir(self.folder))
+        return {m.group(1) for m in matches if m and m.group(2) == extension}
+
+    def days(self) -> list:
+        return sorted(self._days_with("csv"))
+
+    def iter_rows(self, day: str):
+        with open(self.csv_path(day), newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from reader
+
+    def read_from(self, day: str, offset: int = 0):
+        # Rows appended to the day's CSV file after byte `offset`, and the offset
+        # to continue from next time. Offset 0 starts after the header.
+        path = self.csv_path(day)
+        if os.path.getsize(path) == offset:
+            return [], offset
+        with self._lock(shared=True), open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        rows = list(csv.reader(io.StringIO(data.decode("utf-8"), newline="")))
+        return (rows[1:] if offset == 0 else rows), offset + len(data)
+
+    def all_days(self) -> list:
+        # Days with a CSV file, plus days only saved as .xlsx before the store existed.
+        return sorted(self._days_with("csv") | self._days_with("xlsx"))
+
+    def iter_day(self, day: str):
+        # Rows of one day, from its CSV file or else its workbook.
+        if os.path.exists(self.csv_path(day)):
+            yield from self.iter_rows(day)
+            return
+        from openpyxl import load_workbook
+        wb = load_workbook(self.excel_path(day), read_only=True)
+        try:
+            for values in wb.active.iter_rows(min_row=2, values_only=True):
+                yield ["" if v is None else str(v) for v in values[:len(HEADERS)]]
+        finally:
+            wb.close()
+
+    def iter_all(self, first_day: str = None, last_day: str = None):
+        for day in self.all_days():
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            yield from self.iter_day(day)
+
+    def export_excel(self, day: str) -> str:
+        # Rebuild the day's workbook from its CSV file in one streaming pass.
+        # openpyxl is only imported here, off the bot's startup path.
+        from openpyxl import Workbook
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(HEADERS)
+        path = self.excel_path(day)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        # Held until the workbook is in place: a lead appended after the read
+        # would leave the CSV older than the workbook, and compact() would never
+        # export it.
+        with self._lock(shared=True):
+            for row in self.iter_rows(day):
+                ws.append(row)
+            wb.save(tmp_path)
+            os.replace(tmp_path, path)
+        return path
+
+    def compact(self) -> list:
+        # Export every day whose CSV is newer than its workbook.
+        exported = []
+        for day in self.days():
+            excel_path = self.excel_path(day)
+            if os.path.exists(excel_path) and os.path.getmtime(excel_path) >= os.path.getmtime(self.csv_path(day)):
+                continue
+            exported.append(self.export_excel(day))
+        return exported
+
+
+def lead_to_row(lead: dict) -> list:
+    return [
+        lead.get("date") or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        lead.get("telegram_username", ""),
+        lead.get("keytos_username", ""),
+        lead.get("flow", ""),
+        lead.get("email", ""),
+        lead.get("language", "")
+    ]
+
+
+if __name__ == '__main__':
+    # Usage: python lead_store.py [YYYY-MM-DD ...]
+    # Without arguments every day with new leads is exported to .xlsx.
+    logging.basicConfig(level=logging.INFO)
+    store = LeadStore()
+    if len(sys.argv) > 1:
+        paths = [store.export_excel(day) for day in sys.argv[1:]]
+    else:
+        paths = store.compact()
+    for path in paths:
+        print(path)
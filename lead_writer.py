@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from metrics import LEAD_WRITE_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop(): write what's left and exit.
+_STOP = object()
+
+
+class LeadWriter:
+    """Background writer for the lead store.
+
+    Handlers only call enqueue(); a single task drains the queue and writes
+    leads that arrive close together in one batch on a worker thread, so disk
+    I/O never runs on the event loop. A batch that fails to write is kept and
+    retried every retry_delay seconds; stop() writes everything still queued
+    or waiting for a retry.
+    """
+
+    def __init__(self, store, linger: float = 0.2, max_batch: int = 500, retry_delay: float = 5):
+        self.store = store
+        self.linger = linger
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.queue = asyncio.Queue()
+        self._task = None
+        # The batch being built or retried, already taken off the queue.
+        self._batch = []
+        self._stopping = asyncio.Event()
+        # Stats
+        self.leads_written = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def enqueue(self, lead: dict):
+        # Stamp the lead now so a delayed flush doesn't shift its time.
+        lead.setdefault("date", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self.queue.put_nowait(lead)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize() + len(self._batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Let the background task write whatever is queued or being batched, then exit.
+        if self._task is not None:
+            self.queue.put_nowait(_STOP)
+            self._stopping.set()
+            await self._task
+            self._task = None
+        else:
+            self._drain(self._batch)
+            await self._flush_final()
+        logger.info("Lead writer stopped: %s", self.stats())
+
+    async def _run(self):
+        while True:
+            if not self._batch:
+                lead = await self.queue.get()
+                if lead is _STOP:
+                    return
+                self._batch.append(lead)
+            # Give leads arriving right behind this one a chance to join the batch.
+            await asyncio.sleep(self.linger)
+            if self._drain(self._batch):
+                await self._flush_final()
+                return
+            if await self._flush(self._batch):
+                self._batch = []
+            else:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.retry_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _drain(self, batch: list) -> bool:
+        # Move queued leads into the batch; True once stop() has been called.
+        while len(batch) < self.max_batch:
+            try:
+                lead = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if lead is _STOP:
+                return True
+            batch.append(lead)
+        return False
+
+    async def _flush_final(self):
+        # Write every remaining lead, a batch at a time, when shutting down.
+        while self._batch:
+            batch = self._batch[:self.max_batch]
+            if not await self._flush(batch):
+                logger.error("Lost %d leads that could not be written: %s", len(batch), batch)
+            del self._batch[:len(batch)]
+            self._drain(self._batch)
+
+    async def _flush(self, batch: list) -> bool:
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.store.append_many, batch)
+        except Exception as e:
+            logger.error("Failed to write %d leads, will retry: %s", len(batch), e)
+            return False
+        latency = time.perf_counter() - started
+        LEAD_WRITE_LATENCY.observe(latency)
+        self.leads_written += len(batch)
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+        logger.info("Wrote %d leads in %.1f ms (queue depth %d)", len(batch), latency * 1000, self.queue_depth)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "leads_written": self.leads_written,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_latency * 1000, 2),
+            "max_flush_ms": round(self.max_flush_latency * 1000, 2),
+            "avg_flush_ms": round(self.total_flush_latency * 1000 / self.flushes, 2) if self.flushes else 0.0
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+SAMPLES_BASE_URL = "https://keyroom-images-bucket.s3.eu-central-1.amazonaws.com"
+# Languages that have their own sample screenshots; the rest use the English ones.
+SAMPLE_LANGUAGES = ["eng", "ita", "spa"]
+# Defaults; the bot passes SAMPLES_VERSION and SAMPLES_TTL from its Config (see config.py).
+SAMPLES_VERSION = "1"
+SAMPLES_TTL = 7 * 24 * 3600
+
+
+class SampleMediaCache:
+    """Telegram file_ids of the deposit proof sample screenshots.
+
+    The first time a language's samples are sent they are fetched by Telegram
+    from S3; the file_ids Telegram returns are saved to a JSON file and used for
+    every later send, so the images aren't downloaded again for each user.
+    """
+
+    def __init__(self, path="media_cache.json", version=SAMPLES_VERSION, ttl=SAMPLES_TTL):
+        self.path = path
+        self.version = version
+        self.ttl = ttl
+        self.entries = self._load()
+        self._locks = {}
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error("Failed to read media cache %s: %s", self.path, e)
+            return {}
+        if data.get("version") != self.version:
+            return {}
+        return data.get("samples", {})
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "samples": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, image_lang: str):
+        entry = self.entries.get(image_lang)
+        if entry and time.time() - entry["uploaded_at"] < self.ttl:
+            return entry["file_ids"]
+        return None
+
+    def media(self, image_lang: str) -> list:
+        file_ids = self.get(image_lang)
+        if file_ids:
+            pc, mobile = file_ids
+        else:
+            pc = f"{SAMPLES_BASE_URL}/{image_lang}_pc.png?v={self.version}"
+            mobile = f"{SAMPLES_BASE_URL}/{image_lang}_mobile.png?v={self.version}"
+        return [
+            InputMediaPhoto(pc, caption="PC Screenshot"),
+            InputMediaPhoto(mobile, caption="Mobile Screenshot")
+        ]
+
+    def invalidate(self, image_lang: str, file_ids: list, error: Exception):
+        # Forget file_ids Telegram rejected (e.g. after a bot token change), unless
+        # another send has already replaced them.
+        entry = self.entries.get(image_lang)
+        if entry and entry["file_ids"] == file_ids:
+            logger.warning("Cached %s samples rejected (%s); uploading them again", image_lang, error)
+            del self.entries[image_lang]
+            self._save_logged()
+
+    def _save_logged(self):
+        try:
+            self._save()
+        except OSError as e:
+            logger.error("Failed to save media cache %s: %s", self.path, e)
+
+    async def send_samples(self, bot, chat_id: int, lang: str):
+        image_lang = lang if lang in SAMPLE_LANGUAGES else "eng"
+        file_ids = self.get(image_lang)
+        if file_ids:
+            try:
+                return await bot.send_media_group(chat_id=chat_id, media=self.media(image_lang))
+            except BadRequest as e:
+                # e.g. "Wrong file identifier/http url specified"; anything else,
+                # like "Chat not found", isn't the cache's fault.
+                if "file" not in str(e).lower():
+                    raise
+                self.invalidate(image_lang, file_ids, e)
+        # Only one upload per language at a time; the others wait and reuse its file_ids.
+        lock = self._locks.setdefault(image_lang, asyncio.Lock())
+        async with lock:
+            media = self.media(image_lang)
+            messages = await bot.send_media_group(chat_id=chat_id, media=media)
+            if not self.get(image_lang):
+                self.entries[image_lang] = {
+                    "file_ids": [m.photo[-1].file_id for m in messages],
+                    "uploaded_at": time.time()
+                }
+                self._save_logged()
+            return messages
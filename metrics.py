@@ -0,0 +1,198 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+from telegram.error import TimedOut
+from telegram.request import BaseRequest, HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+# Every metric registers itself here; render() writes them all out.
+REGISTRY = []
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join('%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback when rendered."""
+
+    def __init__(self, name: str, help: str, function=None):
+        self.name = name
+        self.help = help
+        self.function = function
+        REGISTRY.append(self)
+
+    def set_function(self, function):
+        self.function = function
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        if self.function is not None:
+            lines.append(f"{self.name} {self.function()}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self.values = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+HANDLER_LATENCY = Histogram("bot_handler_seconds", "Time spent in each handler.", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Exceptions raised by handlers.", ["handler", "exception"])
+API_LATENCY = Histogram("bot_api_request_seconds", "Bot API request latency.", ["method"])
+API_ERRORS = Counter("bot_api_errors_total", "Failed Bot API requests.", ["method", "exception"])
+API_POOL_WAIT = Histogram("bot_api_pool_wait_seconds", "Time Bot API calls waited for a free connection.",
+                          ["pool"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+API_POOL_TIMEOUTS = Counter("bot_api_pool_timeouts_total", "Bot API calls given up waiting for a connection.",
+                            ["pool"])
+FUNNEL_STEPS = Counter("bot_funnel_steps_total", "Users reaching each funnel step.", ["step", "language", "flow"])
+LEAD_WRITE_LATENCY = Histogram("bot_lead_write_seconds", "Time to write one batch of leads.")
+LEAD_QUEUE_DEPTH = Gauge("bot_lead_queue_depth", "Leads waiting to be written.")
+NOTIFICATION_QUEUE_DEPTH = Gauge("bot_owner_notification_queue_depth", "Owner notifications waiting to be sent.")
+UPDATES_DROPPED = Counter("bot_updates_dropped_total", "Updates dropped by the throttle.", ["reason"])
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def instrumented(name: str):
+    """Decorator recording a handler's latency and exceptions."""
+    def decorator(callback):
+        @functools.wraps(callback)
+        async def wrapper(*args):
+            # (update, context), or (self, update, context) for methods.
+            started = time.perf_counter()
+            try:
+                return await callback(*args)
+            except Exception as e:
+                HANDLER_ERRORS.inc(name, type(e).__name__)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest recording the latency and errors of every Bot API call.
+
+    Calls also take one of connection_pool_size slots before they are sent,
+    so the time spent waiting for a free connection (which httpx doesn't
+    report) is measured here, per pool name, as bot_api_pool_wait_seconds.
+    Waiting longer than the pool timeout fails the call with TimedOut, as
+    httpx's own pool timeout does.
+    """
+
+    def __init__(self, pool: str = "bot", connection_pool_size: int = 256, pool_timeout: float = 1.0, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, pool_timeout=pool_timeout, **kwargs)
+        self.pool = pool
+        self.pool_timeout = pool_timeout
+        self._slots = asyncio.Semaphore(connection_pool_size)
+
+    async def _acquire_slot(self, timeout):
+        if not self._slots.locked():
+            await self._slots.acquire()
+            API_POOL_WAIT.observe(0.0, self.pool)
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            API_POOL_TIMEOUTS.inc(self.pool)
+            raise TimedOut("Pool timeout: all connections of the %s pool are in use" % self.pool)
+        finally:
+            API_POOL_WAIT.observe(time.perf_counter() - started, self.pool)
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            await self._acquire_slot(self.pool_timeout if pool_timeout is BaseRequest.DEFAULT_NONE else pool_timeout)
+            try:
+                status, payload = await super().do_request(
+                    url, method, request_data=request_data, read_timeout=read_timeout, write_timeout=write_timeout,
+                    connect_timeout=connect_timeout, pool_timeout=pool_timeout
+                )
+            finally:
+                self._slots.release()
+            if status >= 400:
+                API_ERRORS.inc(api_method, f"HTTP {status}")
+            return status, payload
+        except Exception as e:
+            API_ERRORS.inc(api_method, type(e).__name__)
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, api_method)
+
+
+# aiohttp is only imported once the metrics endpoint is served.
+async def handle_metrics(request):
+    from aiohttp import web
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int):
+    from aiohttp import web
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics available on http://%s:%d/metrics", host, port)
+    return runner
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from collections import deque
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits
+MAX_MESSAGE_LENGTH = 4096
+MAX_MEDIA_GROUP = 10
+
+
+class OwnerNotifier:
+    """Delivers lead notifications to the owner chat in the background.
+
+    Handlers call notify_text()/notify_photo() and return right away. A single
+    task sends the queued notifications, staying under the group's rate limit
+    with a token bucket. Text notifications waiting at the same time are
+    merged into one digest message and photos are sent as media groups.
+    Sends are retried on RetryAfter and network errors.
+    """
+
+    def __init__(self, chat_id: int, per_minute: float = 20, burst: int = 5, digest: bool = True,
+                 max_retries: int = 5):
+        self.chat_id = chat_id
+        self.bucket = TokenBucket(per_minute / 60, burst)
+        # Telegram counts every photo of an album as a message, so an album
+        # takes a token per photo and can't be larger than the bucket.
+        self.max_media_group = max(1, min(MAX_MEDIA_GROUP, int(burst)))
+        self.digest = digest
+        self.max_retries = max_retries
+        self.bot = None
+        self._pending = deque()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._sending = False
+        # Stats
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def notify_text(self, text: str):
+        self._pending.append(("text", text))
+        self._wakeup.set()
+
+    def notify_photo(self, file_id: str, caption: str):
+        self._pending.append(("photo", (file_id, caption)))
+        self._wakeup.set()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def start(self, bot):
+        self.bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 30):
+        # Give queued notifications a chance to go out, then give up on the rest.
+        if self._task is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._pending or self._sending) and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.failed += len(self._pending)
+        for kind, payload in self._pending:
+            logger.error("Owner notification not sent (%s): %s", kind, payload)
+        self._pending.clear()
+
+    async def _run(self):
+        while True:
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await self.bucket.acquire()
+            # Everything that queued up while we waited for a token joins this send.
+            self._sending = True
+            try:
+                if self._pending[0][0] == "photo":
+                    photos = self._take("photo", self.max_media_group)
+                    await self.bucket.acquire(len(photos) - 1)
+                    await self._send_photos(photos)
+                else:
+                    await self._send_texts(self._take("text", 1 if not self.digest else len(self._pending)))
+            finally:
+                self._sending = False
+
+    def _take(self, kind: str, limit: int) -> list:
+        taken = []
+        remaining = deque()
+        length = 0
+        while self._pending:
+            item = self._pending.popleft()
+            if item[0] != kind or len(taken) >= limit:
+                remaining.append(item)
+                continue
+            if kind == "text":
+                length += len(item[1]) + 2
+                if taken and length > MAX_MESSAGE_LENGTH:
+                    remaining.append(item)
+                    limit = len(taken)
+                    continue
+            taken.append(item[1])
+        self._pending = remaining
+        return taken
+
+    async def _send_texts(self, texts: list):
+        text = "\n\n".join(texts)
+        await self._send(lambda: self.bot.send_message(chat_id=self.chat_id, text=text), len(texts), text)
+
+    async def _send_photos(self, photos: list):
+        if len(photos) == 1:
+            file_id, caption = photos[0]
+            send = lambda: self.bot.send_photo(chat_id=self.chat_id, photo=file_id, caption=caption)
+        else:
+            media = [InputMediaPhoto(file_id, caption=caption) for file_id, caption in photos]
+            send = lambda: self.bot.send_media_group(chat_id=self.chat_id, media=media)
+        await self._send(send, len(photos), photos, tokens=len(photos))
+
+    async def _send(self, send, count: int, payload, tokens: int = 1):
+        # Counted as failed too if stop() gives up while it's being retried.
+        sent = False
+        try:
+            sent = await self._send_with_retries(send, tokens)
+        finally:
+            if sent:
+                self.sent += count
+            else:
+                self.failed += count
+                logger.error("Owner notification not sent: %s", payload)
+
+    async def _send_with_retries(self, send, tokens: int) -> bool:
+        delay = 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                await send()
+                return True
+            except RetryAfter as e:
+                wait = e.retry_after
+                wait = wait.total_seconds() if hasattr(wait, "total_seconds") else wait
+                logger.warning("Owner chat flood limit hit, retrying in %s s", wait)
+                self.bucket.pause(wait)
+                await self.bucket.acquire(tokens)
+            except (BadRequest, Forbidden) as e:
+                # Retrying won't help.
+                logger.error("Failed to notify owner: %s", e)
+                return False
+            except NetworkError as e:
+                logger.warning("Network error notifying owner (attempt %d): %s", attempt + 1, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            except Exception as e:
+                logger.error("Failed to notify owner: %s", e)
+                return False
+            self.retries += 1
+        return False
+
+    def stats(self) -> dict:
+        return {"queue_depth": self.queue_depth, "sent": self.sent, "retries": self.retries, "failed": self.failed}
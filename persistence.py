@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """Keeps user_data and conversation states in SQLite so restarts don't lose
+    users that are halfway through a flow.
+
+    - user_data is loaded lazily: nothing is read at startup, a user's row is
+      read the first time one of their updates is handled.
+    - Only entries whose content changed since they were loaded or last
+      written are saved.
+    - All entries the application hands over in one persistence run (every
+      update_interval seconds) are written in a single transaction on a
+      worker thread.
+    """
+
+    def __init__(self, path: str = "bot_state.sqlite3", update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.path = path
+        self._db = None
+        self._db_lock = threading.Lock()
+        # user_id -> JSON last loaded from / written to the database.
+        self._user_blobs = {}
+        # Writes collected during the current persistence run.
+        self._pending_users = {}
+        self._pending_conversations = {}
+        self._flush_future = None
+
+    def _connect(self):
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS conversations "
+                "(name TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, PRIMARY KEY (name, key))"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._db_lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    # Loading
+
+    async def get_user_data(self) -> dict:
+        # Loaded per user in refresh_user_data.
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        if user_id in self._user_blobs:
+            return
+        rows = await asyncio.to_thread(self._query, "SELECT data FROM user_data WHERE user_id = ?", (user_id,))
+        blob = rows[0][0] if rows else None
+        self._user_blobs[user_id] = blob
+        if blob:
+            # Keep anything a handler stored before the row was read.
+            user_data.update({k: v for k, v in json.loads(blob).items() if k not in user_data})
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = await asyncio.to_thread(self._query, "SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    # Saving
+
+    async def update_user_data(self, user_id: int, data: dict):
+        blob = json.dumps(data, sort_keys=True, default=str)
+        if blob == self._user_blobs.get(user_id):
+            return
+        self._pending_users[user_id] = blob
+        await self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int):
+        self._pending_users[user_id] = None
+        await self._schedule_flush()
+
+    async def update_conversation(self, name: str, key, new_state):
+        self._pending_conversations[(name, json.dumps(list(key)))] = new_state
+        await self._schedule_flush()
+
+    def _schedule_flush(self):
+        # The application gathers all update_* calls of a persistence run, so
+        # the first one schedules a flush that runs once they have all queued
+        # their entries, and they all wait on it.
+        if self._flush_future is None:
+            self._flush_future = asyncio.ensure_future(self._flush_pending())
+        return asyncio.shield(self._flush_future)
+
+    async def _flush_pending(self):
+        await asyncio.sleep(0)
+        self._flush_future = None
+        users, self._pending_users = self._pending_users, {}
+        conversations, self._pending_conversations = self._pending_conversations, {}
+        if not users and not conversations:
+            return
+        try:
+            await asyncio.to_thread(self._write, users, conversations)
+        except Exception:
+            # Retry with the next run, unless newer data has been queued since.
+            self._pending_users = {**users, **self._pending_users}
+            self._pending_conversations = {**conversations, **self._pending_conversations}
+            raise
+        self._user_blobs.update(users)
+
+    def _write(self, users: dict, conversations: dict):
+        with self._db_lock:
+            db = self._connect()
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)",
+                    [(user_id, blob) for user_id, blob in users.items() if blob is not None]
+                )
+                db.executemany(
+                    "DELETE FROM user_data WHERE user_id = ?",
+                    [(user_id,) for user_id, blob in users.items() if blob is None]
+                )
+                db.executemany(
+                    "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                    [(name, key, json.dumps(state)) for (name, key), state in conversations.items()
+                     if state is not None]
+                )
+                db.executemany(
+                    "DELETE FROM conversations WHERE name = ? AND key = ?",
+                    [(name, key) for (name, key), state in conversations.items() if state is None]
+                )
+        logger.debug("Persisted %d users and %d conversations", len(users), len(conversations))
+
+    async def flush(self):
+        if self._flush_future is not None:
+            await self._flush_future
+        await self._flush_pending()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Not stored
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        pass
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
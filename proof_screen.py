@@ -0,0 +1,173 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; screening is disabled without it.
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+
+def dhash(data: bytes) -> int:
+    """64-bit difference hash of an image: each bit says whether a pixel of the
+    9x8 grayscale thumbnail is brighter than its right neighbour."""
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ProofIndex:
+    """Persistent index of deposit proof hashes with Hamming-distance search.
+
+    Each hash is split into max_distance + 1 bands. Two hashes within
+    max_distance bits of each other must have at least one identical band, so
+    a search only compares against proofs sharing a band (an indexed lookup)
+    instead of every proof ever received.
+    """
+
+    def __init__(self, path: str = "proofs.sqlite3", max_distance: int = 4):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        widths = [HASH_BITS // bands + (1 if i < HASH_BITS % bands else 0) for i in range(bands)]
+        self.bands = []
+        shift = HASH_BITS
+        for width in widths:
+            shift -= width
+            self.bands.append((shift, (1 << width) - 1))
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS proofs (id INTEGER PRIMARY KEY, hash TEXT NOT NULL, "
+            "file_unique_id TEXT, telegram_username TEXT, created TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS proofs_file ON proofs (file_unique_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS proof_bands (band INTEGER, value INTEGER, proof_id INTEGER)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS proof_bands_lookup ON proof_bands (band, value)")
+        self._db.commit()
+
+    def _band_values(self, value: int) -> list:
+        return [(band, (value >> shift) & mask) for band, (shift, mask) in enumerate(self.bands)]
+
+    def search(self, value: int, file_unique_id: str = None) -> list:
+        # Earlier proofs that are the same file or within max_distance bits,
+        # as (distance, telegram_username, created), closest first.
+        with self._lock:
+            candidates = set()
+            for band, band_value in self._band_values(value):
+                candidates.update(self._db.execute(
+                    "SELECT p.id, p.hash, p.telegram_username, p.created FROM proof_bands b "
+                    "JOIN proofs p ON p.id = b.proof_id WHERE b.band = ? AND b.value = ?", (band, band_value)
+                ))
+            if file_unique_id:
+                candidates.update(self._db.execute(
+                    "SELECT id, hash, telegram_username, created FROM proofs WHERE file_unique_id = ?",
+                    (file_unique_id,)
+                ))
+        matches = []
+        for _, other, username, created in candidates:
+            distance = hamming(value, int(other, 16))
+            if distance <= self.max_distance:
+                matches.append((distance, username, created))
+        return sorted(matches)
+
+    def add(self, value: int, file_unique_id: str, telegram_username: str):
+        with self._lock, self._db:
+            proof_id = self._db.execute(
+                "INSERT INTO proofs (hash, file_unique_id, telegram_username, created) VALUES (?, ?, ?, ?)",
+                (f"{value:016x}", file_unique_id, telegram_username, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            ).lastrowid
+            self._db.executemany(
+                "INSERT INTO proof_bands (band, value, proof_id) VALUES (?, ?, ?)",
+                [(band, band_value, proof_id) for band, band_value in self._band_values(value)]
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ProofScreener:
+    """Checks deposit proofs against every proof received before.
+
+    start() downloads the largest photo size into memory, hashes it in a
+    process pool and looks it up in the ProofIndex, all in a background task;
+    result() later returns a warning for the owner if the screenshot was seen
+    before (from this or another account), or None.
+    """
+
+    def __init__(self, index: ProofIndex, workers: int = 2):
+        self.index = index
+        self.workers = workers
+        self._pool = None
+        self._tasks = {}
+
+    @staticmethod
+    def available() -> bool:
+        return Image is not None
+
+    def start(self, bot, photo, user_id: int, telegram_username: str):
+        previous = self._tasks.pop(user_id, None)
+        if previous:
+            previous.cancel()
+        task = asyncio.create_task(self._screen(bot, photo, telegram_username))
+        # Users who never finish the flow never collect their result; don't let
+        # their finished tasks pile up or warn about unretrieved exceptions.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        if len(self._tasks) >= 10000:
+            self._tasks = {uid: t for uid, t in self._tasks.items() if not t.done()}
+        self._tasks[user_id] = task
+
+    async def result(self, user_id: int, timeout: float = 5):
+        task = self._tasks.pop(user_id, None)
+        if task is None:
+            return None
+        try:
+            return await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Proof screening for user %s timed out", user_id)
+        except Exception as e:
+            logger.error("Proof screening for user %s failed: %s", user_id, e)
+        return None
+
+    async def _screen(self, bot, photo, telegram_username: str):
+        file = await bot.get_file(photo.file_id)
+        data = bytes(await file.download_as_bytearray())
+        if self._pool is None:
+            # Forking a process that already runs threads (to_thread, sqlite) can deadlock.
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        value = await asyncio.get_running_loop().run_in_executor(self._pool, dhash, data)
+        matches = await asyncio.to_thread(self.index.search, value, photo.file_unique_id)
+        await asyncio.to_thread(self.index.add, value, photo.file_unique_id, telegram_username)
+        if not matches:
+            return None
+        distance, username, created = matches[0]
+        kind = "Same screenshot" if distance == 0 else "Similar screenshot"
+        more = f" (+{len(matches) - 1} more)" if len(matches) > 1 else ""
+        return f"⚠️ {kind} already sent by {username} on {created}{more}"
+
+    def shutdown(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self.index.close()
@@ -0,0 +1,208 @@
+"""Webhook mode with several worker processes (WORKERS > 1).
+
+The main process only receives updates: it checks the secret token and
+passes each update, still as JSON, to the worker owning its chat
+(chat_id % WORKERS). So a chat's updates are always handled by the same
+worker, in order, and its user_data and conversation state are only ever
+written by that worker. Every worker runs the full application, sharing with
+the others:
+
+- bot_state.sqlite3 (WAL mode; each worker writes only its own chats' rows),
+- the lead store, whose CSV appends are serialised with a file lock, and
+  whose new rows every worker indexes every LEAD_INDEX_REFRESH seconds so
+  duplicates are caught across workers,
+- proofs.sqlite3 and media_cache.json.
+
+Nothing restarts a worker that dies: the webhook answers 503 for its chats,
+so Telegram keeps them until the service is restarted, and /healthz reports
+it. Worker N serves its metrics on METRICS_PORT + N. Shard 0 exports the daily
+workbooks periodically; the final export runs once all workers have stopped.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+from aiohttp import web
+from config import Config, load_config
+from lead_store import LeadStore
+from webhook import SECRET_HEADER, WebhookServer
+
+logger = logging.getLogger(__name__)
+
+# Updates waiting for one worker before the webhook answers 503 (Telegram retries them).
+MAX_PENDING_PER_WORKER = 10000
+
+
+def shard_key(data: dict) -> int:
+    # The chat an update belongs to (or its user, for updates without a chat).
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = value.get("from") or value.get("user")
+        if user:
+            return user["id"]
+    return 0
+
+
+class ShardPool:
+    """Worker processes, each running the bot for the chats routed to it."""
+
+    def __init__(self, workers: int, request_factory=None, log_level: int = logging.INFO):
+        # request_factory (a picklable callable returning a BaseRequest) lets
+        # benchmarks give the workers a fake Bot API.
+        self.context = multiprocessing.get_context("spawn")
+        self.queues = [self.context.Queue(MAX_PENDING_PER_WORKER) for _ in range(workers)]
+        self.processes = [
+            self.context.Process(target=run_worker, args=(shard, q, request_factory, log_level),
+                                 name=f"shard-{shard}")
+            for shard, q in enumerate(self.queues)
+        ]
+        self.routed = [0] * workers
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def route(self, data: dict, body: bytes) -> bool:
+        # False if the worker is down or too far behind to take the update.
+        shard = shard_key(data) % len(self.queues)
+        if not self.processes[shard].is_alive():
+            return False
+        try:
+            self.queues[shard].put_nowait(body)
+        except queue.Full:
+            return False
+        self.routed[shard] += 1
+        return True
+
+    def alive(self) -> list:
+        return [process.is_alive() for process in self.processes]
+
+    async def stop(self):
+        # Workers handle what is already queued, then exit.
+        for q, process in zip(self.queues, self.processes):
+            if not process.is_alive():
+                continue
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                await asyncio.to_thread(q.put, None)
+        for process in self.processes:
+            await asyncio.to_thread(process.join)
+
+
+class ShardedWebhookServer(WebhookServer):
+    """WebhookServer that hands updates to a ShardPool instead of an application."""
+
+    def __init__(self, pool: ShardPool, secret_token: str, path: str = "/telegram"):
+        super().__init__(None, secret_token, path)
+        self.pool = pool
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            return web.Response(status=403)
+        if self.draining:
+            return web.Response(status=503)
+        body = await request.read()
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            logger.error("Rejected malformed update: %s", e)
+            return web.Response(status=400)
+        if not self.pool.route(data, body):
+            # Its worker is down or behind; Telegram retries the update later.
+            return web.Response(status=503)
+        self.updates_received += 1
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        alive = self.pool.alive()
+        healthy = not self.draining and all(alive)
+        return web.json_response({
+            "status": "ok" if healthy else "draining" if self.draining else "worker down",
+            "updates_received": self.updates_received,
+            "workers": [{"alive": a, "updates_routed": n} for a, n in zip(alive, self.pool.routed)]
+        }, status=200 if healthy else 503)
+
+
+def run_worker(shard: int, updates, request_factory=None, log_level: int = logging.INFO):
+    # Entry point of a worker process. Ctrl-C reaches the whole process group;
+    # the main process decides when workers stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=log_level, format=f"%(levelname)s:shard-{shard}:%(name)s:%(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(_serve_shard(shard, updates, request_factory))
+
+
+async def _serve_shard(shard: int, updates, request_factory):
+    from telegram import Update
+    import metrics
+    from app import build_application
+    config = load_config()
+    requests = {}
+    if request_factory:
+        requests = {"request": request_factory(), "get_updates_request": request_factory()}
+    application = build_application(config, shard=shard, **requests)
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    metrics_runner = await metrics.start_metrics_server(config.metrics_host, config.metrics_port + shard)
+    loop = asyncio.get_running_loop()
+    try:
+        await application.start()
+        while True:
+            body = await loop.run_in_executor(None, updates.get)
+            if body is None:
+                break
+            try:
+                update = Update.de_json(json.loads(body), application.bot)
+            except Exception as e:
+                logger.error("Dropped malformed update: %s", e)
+                continue
+            await application.update_queue.put(update)
+    finally:
+        logger.info("Stopping, %d updates pending", application.update_queue.qsize())
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await metrics_runner.cleanup()
+
+
+async def run_sharded(config: Config, request_factory=None):
+    """Serve the webhook with config.workers worker processes until SIGINT/SIGTERM."""
+    from telegram import Bot, Update
+    pool = ShardPool(config.workers, request_factory)
+    server = ShardedWebhookServer(pool, config.webhook_secret, config.webhook_path)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    pool.start()
+    try:
+        await server.start(config.webhook_host, config.webhook_port)
+        async with Bot(config.token, request=request_factory() if request_factory else None) as bot:
+            await bot.set_webhook(url=config.webhook_url.rstrip("/") + config.webhook_path,
+                                  secret_token=config.webhook_secret, allowed_updates=Update.ALL_TYPES)
+        logger.info("Sharding updates across %d workers", config.workers)
+        await stop_event.wait()
+    finally:
+        logger.info("Shutting down webhook server and workers")
+        await server.stop()
+        await pool.stop()
+        # Every worker has written its leads; leave up-to-date workbooks behind.
+        await asyncio.to_thread(LeadStore().compact)
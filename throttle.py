@@ -0,0 +1,89 @@
+import logging
+import time
+from collections import OrderedDict
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, ContextTypes, TypeHandler
+from metrics import UPDATES_DROPPED
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class _UserState:
+    __slots__ = ("bucket", "last_start", "last_callback")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.last_start = (None, 0.0)  # (text, time)
+        self.last_callback = (None, 0.0)  # ((message_id, data), time)
+
+
+class Throttle:
+    """Drops abusive updates before they reach the ConversationHandler.
+
+    Every user gets a token bucket (kept in an LRU of at most max_users
+    entries); an update without a token is dropped. Pressing the same button
+    of the same message again within callback_window seconds, or repeating
+    the same /start within start_window seconds, is dropped too, so spamming
+    doesn't cost us menus, deletes and sample photos on the Bot API.
+    """
+
+    def __init__(self, per_minute: float = 30, burst: int = 10, start_window: float = 3,
+                 callback_window: float = 2, max_users: int = 100000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.start_window = start_window
+        self.callback_window = callback_window
+        self.max_users = max_users
+        self.users = OrderedDict()
+
+    def _state(self, user_id: int) -> _UserState:
+        state = self.users.get(user_id)
+        if state is None:
+            state = self.users[user_id] = _UserState(TokenBucket(self.rate, self.burst))
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(user_id)
+        return state
+
+    def check(self, update: Update):
+        # The reason to drop the update, or None to let it through.
+        user = update.effective_user
+        if user is None:
+            return None
+        state = self._state(user.id)
+        now = time.monotonic()
+        query = update.callback_query
+        if query is not None:
+            key = (query.message.message_id if query.message else None, query.data)
+            last_key, last_time = state.last_callback
+            state.last_callback = (key, now)
+            if key == last_key and now - last_time < self.callback_window:
+                return "duplicate_callback"
+        message = update.message
+        if message is not None and message.text and message.text.startswith("/start"):
+            last_text, last_time = state.last_start
+            state.last_start = (message.text, now)
+            if message.text == last_text and now - last_time < self.start_window:
+                return "repeated_start"
+        if not state.bucket.try_acquire():
+            return "rate_limited"
+        return None
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        reason = self.check(update)
+        if reason:
+            UPDATES_DROPPED.inc(reason)
+            if update.callback_query is not None:
+                # Otherwise the button keeps spinning until Telegram gives up on it.
+                try:
+                    await update.callback_query.answer()
+                except TelegramError as e:
+                    logger.debug("Failed to answer a dropped callback query: %s", e)
+            raise ApplicationHandlerStop
+
+    def handler(self) -> TypeHandler:
+        # Register in a group before the ConversationHandler's, e.g. group=-1.
+        return TypeHandler(Update, self.handle)
@@ -0,0 +1,28 @@
+from telegram import Update
+from telegram.ext import ContextTypes, TypeHandler
+
+
+class UpdateLog:
+    """Appends every incoming update to a file, one JSON object per line.
+
+    The file can be replayed through the bot with benchmarks/replay_updates.py,
+    e.g. to check a change to funnel.json against real traffic. It holds what
+    users sent (usernames, emails), so only turn it on while recording.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Line buffered, so a crash loses at most the update being written.
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self.written = 0
+
+    async def handle(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        self._file.write(update.to_json() + "\n")
+        self.written += 1
+
+    def handler(self) -> TypeHandler:
+        # Register in a group before the throttle's, e.g. group=-2, so dropped updates are logged too.
+        return TypeHandler(Update, self.handle)
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+import logging
+import signal
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Embedded aiohttp server that receives updates from Telegram.
+
+    POST <path> checks the secret token and puts the update on the
+    application's update queue; GET /healthz reports whether the server is
+    accepting updates and how many are still waiting to be processed.
+    """
+
+    def __init__(self, application, secret_token: str, path: str = "/telegram"):
+        self.application = application
+        self.secret_token = secret_token
+        self.path = path
+        self.draining = False
+        self.updates_received = 0
+        self.web_app = web.Application()
+        self.web_app.router.add_post(path, self.handle_update)
+        self.web_app.router.add_get("/healthz", self.handle_health)
+        self._runner = None
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        token = request.headers.get(SECRET_HEADER, "")
+        if not hmac.compare_digest(token, self.secret_token):
+            return web.Response(status=403)
+        if self.draining:
+            # Telegram retries the update later, once a new instance is up.
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.error("Rejected malformed update: %s", e)
+            return web.Response(status=400)
+        self.updates_received += 1
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "draining" if self.draining else "ok",
+            "updates_received": self.updates_received,
+            "pending_updates": self.application.update_queue.qsize()
+        }, status=503 if self.draining else 200)
+
+    async def start(self, host: str, port: int):
+        self._runner = web.AppRunner(self.web_app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info("Webhook server listening on %s:%d%s", host, port, self.path)
+
+    async def stop(self):
+        # Stop taking new updates; the ones already queued are processed by application.stop().
+        self.draining = True
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def run_webhook(application, url: str, secret_token: str, host: str = "0.0.0.0", port: int = 8080,
+                      path: str = "/telegram"):
+    """Serve the application through a webhook until SIGINT/SIGTERM."""
+    server = WebhookServer(application, secret_token, path)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    try:
+        await application.start()
+        await server.start(host, port)
+        await application.bot.set_webhook(
+            url=url.rstrip("/") + path, secret_token=secret_token, allowed_updates=Update.ALL_TYPES
+        )
+        await stop_event.wait()
+    finally:
+        logger.info("Shutting down webhook server, draining %d pending updates",
+                    application.update_queue.qsize())
+        await server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)